@@ -0,0 +1,99 @@
+"""应用设置
+
+集中管理下载调度、后处理等可调参数。设置保存在 config/app_settings.json 中，
+文件不存在或缺少某个键时使用 DEFAULT_SETTINGS 中的默认值。
+"""
+
+import os
+import sys
+import json
+
+# 默认设置
+DEFAULT_SETTINGS = {
+    # 下载调度：常驻下载线程数与最大下载线程数
+    "download_min_workers": 2,
+    "download_max_workers": 6,
+    # 距离过期不足该秒数的URL视为紧急
+    "download_urgent_seconds": 600,
+    # 每出现多少个紧急URL增加一个下载线程
+    "download_urgent_per_worker": 2,
+    # 无法从URL解析过期时间时假定的有效期（秒）
+    "download_default_ttl": 3600,
+    # 后处理进程数（格式转换、元数据写入）
+    "postprocess_workers": 2,
+    # 下载完成后额外生成的缩小版本（最长边像素），例如 [1024, 512]
+    "postprocess_variants": [],
+    # 保存为JPEG/WebP/AVIF时的默认质量
+    "save_quality": 92,
+    # 状态栏保留的最大行数，更早的行写入 logs/status.log
+    "status_max_lines": 2000,
+    "status_log_max_bytes": 5 * 1024 * 1024,
+    "status_log_backups": 3,
+    # 图像内存缓存（缩略图、金字塔、PhotoImage）的字节预算（MB），正在显示的图像不计入淘汰
+    "image_cache_mb": 512,
+    # 提示词优化结果缓存的有效期（秒）和最多条目数
+    "prompt_cache_ttl": 7 * 24 * 3600,
+    "prompt_cache_max_entries": 1000,
+    # 批量优化提示词：同时进行的DeepSeek请求数、每分钟请求数上限（0表示不限制）
+    "batch_optimize_concurrency": 4,
+    "batch_optimize_rpm": 60,
+    # 批量优化改用异步客户端在一个事件循环中并发请求，此时并发数上限为 batch_optimize_async_concurrency
+    "batch_optimize_async": False,
+    "batch_optimize_async_concurrency": 64,
+    # 同时进行的图像生成请求数、排队等待的生成任务数上限（批量提交时的背压）
+    "generation_workers": 4,
+    "generation_queue_size": 10,
+    # 批量任务中近似重复提示词的判定阈值（字符n-gram的Jaccard相似度），0表示不去重
+    "dedup_threshold": 0.85,
+    # DeepSeek共享客户端：请求超时（秒）、连接池最大连接数和保持的空闲连接数
+    "deepseek_timeout": 600,
+    "deepseek_max_connections": 20,
+    "deepseek_max_keepalive": 10,
+    # API连通性探测结果的有效期（秒），期间生成任务据此跳过已知无效的密钥
+    "connectivity_ttl": 300,
+}
+
+
+def get_data_dir():
+    """获取应用数据目录（输出图像、缓存、配置等）"""
+    if getattr(sys, 'frozen', False):
+        # 封装环境：与升级检查器一致，使用可执行文件上级目录
+        return os.path.abspath(os.path.join(os.path.dirname(sys.executable), '..'))
+    # 开发环境：使用源码所在目录
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def data_path(*parts):
+    """获取应用数据目录下的路径"""
+    return os.path.join(get_data_dir(), *parts)
+
+
+def get_settings_file():
+    """获取设置文件路径"""
+    return data_path('config', 'app_settings.json')
+
+
+def load_settings():
+    """加载设置，缺失的键使用默认值"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings_file = get_settings_file()
+    try:
+        if os.path.exists(settings_file):
+            with open(settings_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if isinstance(saved, dict):
+                settings.update(saved)
+    except Exception as e:
+        print(f"加载应用设置失败: {str(e)}")
+    return settings
+
+
+def save_settings(settings):
+    """保存设置到文件"""
+    settings_file = get_settings_file()
+    try:
+        os.makedirs(os.path.dirname(settings_file), exist_ok=True)
+        with open(settings_file, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"保存应用设置失败: {str(e)}")
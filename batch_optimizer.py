@@ -0,0 +1,308 @@
+"""批量提示词优化
+
+从文本文件读取提示词（每行一条），在并发数上限和速率限制下调用DeepSeek逐条优化，
+命中优化缓存的提示词不发送请求，近似重复的提示词只优化一次。结果按原始顺序写入JSONL文件；中断后再次运行同一输出文件时，
+从已完成的部分继续。
+AsyncBatchOptimizer 在一个事件循环中用异步客户端并发请求，数百个请求同时进行也不需要对应数量的线程。
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from prompt_optimizer import optimize_prompt, async_optimize_prompt
+from near_dedup import dedupe_prompts
+
+# 批量优化期间优化缓存的写盘间隔（秒），结束时再写一次
+CACHE_FLUSH_SECONDS = 30
+
+
+def read_prompt_file(path):
+    """读取提示词文件，忽略空行和以 # 开头的注释行"""
+    prompts = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                prompts.append(line)
+    return prompts
+
+
+def default_output_path(input_path):
+    """输入文件旁的默认输出路径"""
+    base, _ = os.path.splitext(input_path)
+    return base + '_optimized.jsonl'
+
+
+class RateLimiter:
+    def __init__(self, requests_per_minute, burst=None):
+        """令牌桶速率限制器
+
+        Args:
+            requests_per_minute: 每分钟允许的请求数，0表示不限制
+            burst: 允许的突发请求数，默认等于每秒速率（至少1）
+        """
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """尝试取得一个令牌，成功返回0，否则返回预计需要等待的秒数"""
+        if self.rate <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, cancel_event=None):
+        """阻塞直到获得一个令牌，取消时返回False"""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return True
+            if cancel_event is not None:
+                if cancel_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class _OrderedWriter:
+    def __init__(self, output, start, total, log):
+        """按原始顺序写出结果：先完成的结果暂存，直到前面的结果都写出"""
+        self.output = output
+        self.total = total
+        self.log = log
+        self.next_index = start
+        self.succeeded = start
+        self.failed = 0
+        self._pending = {}    # 已完成但前面还有未完成的结果：序号 -> 结果
+        self._lock = threading.Lock()
+
+    def add(self, index, result):
+        with self._lock:
+            self._pending[index] = result
+            if 'error' in result:
+                self.failed += 1
+            else:
+                self.succeeded += 1
+            # 按原始顺序写出连续完成的结果
+            while self.next_index in self._pending:
+                self.output.write(json.dumps(self._pending.pop(self.next_index), ensure_ascii=False) + "\n")
+                self.next_index += 1
+            self.output.flush()
+            finished = self.succeeded + self.failed
+        if finished % 10 == 0 or finished == self.total:
+            self.log(f"[信息] 批量优化进度: {finished}/{self.total}（失败 {self.failed}）")
+
+    def finish(self, cancel_event):
+        """返回 (成功数, 失败数)"""
+        if cancel_event is not None and cancel_event.is_set():
+            self.log(f"[信息] 批量优化已取消，已完成 {self.next_index}/{self.total} 条，再次运行可继续")
+        return self.succeeded, self.failed
+
+
+class BatchOptimizer:
+    def __init__(self, client, cache, persona_preset, model, max_concurrency=4, requests_per_minute=60,
+                 dedup_threshold=0, log=None, on_usage=None):
+        """初始化批量优化器
+
+        Args:
+            client: OpenAI兼容的DeepSeek客户端（线程安全，所有请求共用）
+            cache: PromptOptimizationCache
+            persona_preset: 人格预设
+            model: DeepSeek模型
+            max_concurrency: 同时进行的请求数上限
+            requests_per_minute: 每分钟请求数上限，0表示不限制
+            dedup_threshold: 近似重复判定阈值，0表示不去重
+            log: 日志函数，参数为一条消息
+            on_usage: 可选，每次实际请求后以 on_usage(usage) 报告用量（命中缓存不调用）
+        """
+        self.client = client
+        self.cache = cache
+        self.persona_preset = persona_preset
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.dedup_threshold = dedup_threshold
+        self.log = log or print
+        self.on_usage = on_usage
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def run(self, input_path, output_path, cancel_event=None):
+        """优化输入文件中的所有提示词，返回 (成功数, 失败数)
+
+        输出文件每行一条结果：{"index", "prompt", "optimized", "cached"}，失败时为 {"index", "prompt", "error"}。
+        """
+        prompts, done = self._prepare(input_path, output_path)
+
+        try:
+            with open(output_path, 'a', encoding='utf-8') as output, \
+                    ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='optimize') as executor:
+                writer = _OrderedWriter(output, done, len(prompts), self.log)
+                futures = [executor.submit(self._optimize_one, index, prompts[index], cancel_event, writer.add)
+                           for index in range(done, len(prompts))]
+                for future in futures:
+                    future.result()
+        finally:
+            self.flush_cache()
+
+        return writer.finish(cancel_event)
+
+    def _prepare(self, input_path, output_path):
+        """读取并去重输入，截断输出文件到有效前缀，返回 (提示词列表, 已完成条数)"""
+        # 去重结果只取决于输入文件，中断后继续时序号保持一致
+        prompts = dedupe_prompts(read_prompt_file(input_path), self.dedup_threshold, self.log)
+        done = self._resume(output_path, prompts)
+        if done:
+            self.log(f"[信息] 批量优化从第 {done + 1} 条继续，已完成 {done}/{len(prompts)} 条")
+        return prompts, done
+
+    def flush_cache(self):
+        """把批量期间缓存的优化结果写入磁盘"""
+        self.cache.flush()
+
+    def _flush_due(self):
+        """距上次写盘已超过 CACHE_FLUSH_SECONDS 时返回True（只有一个调用方会得到True）"""
+        with self._flush_lock:
+            now = time.monotonic()
+            if now - self._last_flush < CACHE_FLUSH_SECONDS:
+                return False
+            self._last_flush = now
+            return True
+
+    def optimize(self, prompt, cancel_event=None):
+        """优化一条提示词，返回 (优化结果, 是否命中缓存)；等待速率限制时被取消返回 (None, False)
+
+        结果只写入内存缓存，定期写盘；调用方在批量结束时调用 flush_cache()。
+        """
+        optimized = self.cache.get(prompt, self.persona_preset, self.model)
+        if optimized is not None:
+            return optimized, True
+        if not self.rate_limiter.acquire(cancel_event):
+            return None, False
+        optimized = optimize_prompt(self.client, prompt, self.persona_preset, self.model, self.on_usage)
+        self.cache.put(prompt, self.persona_preset, self.model, optimized, save=False)
+        if self._flush_due():
+            self.flush_cache()
+        return optimized, False
+
+    def _optimize_one(self, index, prompt, cancel_event, on_done):
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        result = {'index': index, 'prompt': prompt}
+        try:
+            optimized, cached = self.optimize(prompt, cancel_event)
+            if optimized is None:
+                return
+            result['optimized'] = optimized
+            result['cached'] = cached
+        except Exception as e:
+            result['error'] = str(e)
+        on_done(index, result)
+
+    def _resume(self, output_path, prompts):
+        """保留输出文件中与输入一致的成功结果前缀，返回已完成的条数
+
+        写入中断产生的损坏行、失败的结果及其之后的行都会被丢弃并重新处理（成功的部分会命中缓存）。
+        """
+        if not os.path.exists(output_path):
+            return 0
+        kept = []
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    break
+                index = len(kept)
+                if (result.get('index') != index or index >= len(prompts)
+                        or result.get('prompt') != prompts[index] or 'optimized' not in result):
+                    break
+                kept.append(line if line.endswith("\n") else line + "\n")
+        temp_path = output_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+        os.replace(temp_path, output_path)
+        return len(kept)
+
+
+class AsyncBatchOptimizer(BatchOptimizer):
+    def __init__(self, client_factory, cache, persona_preset, model, max_concurrency=64, requests_per_minute=60,
+                 dedup_threshold=0, log=None, on_usage=None):
+        """在一个事件循环中并发优化的批量优化器
+
+        Args:
+            client_factory: 在事件循环中调用、返回异步DeepSeek客户端的函数（如 create_async_deepseek_client），
+                客户端在批量结束时关闭
+            其余参数同 BatchOptimizer
+        """
+        super().__init__(None, cache, persona_preset, model, max_concurrency, requests_per_minute,
+                         dedup_threshold, log, on_usage)
+        self.client_factory = client_factory
+
+    def run(self, input_path, output_path, cancel_event=None):
+        """优化输入文件中的所有提示词，返回 (成功数, 失败数)，输出格式与 BatchOptimizer 相同"""
+        try:
+            return asyncio.run(self._run_async(input_path, output_path, cancel_event))
+        finally:
+            self.flush_cache()
+
+    async def _run_async(self, input_path, output_path, cancel_event):
+        prompts, done = self._prepare(input_path, output_path)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        client = self.client_factory()
+        try:
+            with open(output_path, 'a', encoding='utf-8') as output:
+                writer = _OrderedWriter(output, done, len(prompts), self.log)
+
+                async def optimize_one(index):
+                    async with semaphore:
+                        result = await self._optimize_one_async(client, index, prompts[index], cancel_event)
+                    if result is not None:
+                        writer.add(index, result)
+
+                await asyncio.gather(*(optimize_one(index) for index in range(done, len(prompts))))
+        finally:
+            await client.close()
+        return writer.finish(cancel_event)
+
+    async def _optimize_one_async(self, client, index, prompt, cancel_event):
+        """优化一条提示词，返回结果字典；被取消时返回None"""
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        result = {'index': index, 'prompt': prompt}
+        try:
+            optimized = self.cache.get(prompt, self.persona_preset, self.model)
+            cached = optimized is not None
+            if not cached:
+                # 等待速率限制时不阻塞事件循环
+                while True:
+                    wait = self.rate_limiter.try_acquire()
+                    if not wait:
+                        break
+                    if cancel_event is not None and cancel_event.is_set():
+                        return None
+                    await asyncio.sleep(min(wait, 0.5))
+                optimized = await async_optimize_prompt(client, prompt, self.persona_preset, self.model,
+                                                  self.on_usage)
+                # 缓存写盘会重写整个文件，只在间隔到期时放到线程池中进行，不阻塞事件循环
+                self.cache.put(prompt, self.persona_preset, self.model, optimized, save=False)
+                if self._flush_due():
+                    await asyncio.get_running_loop().run_in_executor(None, self.flush_cache)
+            result['optimized'] = optimized
+            result['cached'] = cached
+        except Exception as e:
+            result['error'] = str(e)
+        return result
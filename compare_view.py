@@ -0,0 +1,129 @@
+"""组图对比窗口
+
+把同一任务的多张输出（最多10张）并排显示，缩放和平移在所有窗格间联动。
+每张图像通过金字塔缓存只解码一次，窗格使用分块渲染的 ZoomViewer，
+联动平移时每个窗格只补渲染新露出的图块，多张2K/4K图像也能流畅对比。
+"""
+
+import math
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from zoom_viewer import ZoomViewer
+
+# 最多同时对比的图像数
+MAX_COMPARE_IMAGES = 10
+
+
+class CompareView:
+    def __init__(self, parent, records, decode_service, pyramid_cache, image_cache, log=None):
+        """创建对比窗口
+
+        Args:
+            parent: 父窗口
+            records: 要对比的图像记录列表（需包含 path）
+            decode_service: DecodeService，在后台构建金字塔
+            pyramid_cache: PyramidCache，与放大预览共享金字塔
+            image_cache: ImageCache，窗口打开期间固定各金字塔
+            log: 日志函数，参数为一条消息
+        """
+        self.records = list(records)[:MAX_COMPARE_IMAGES]
+        self.pyramid_cache = pyramid_cache
+        self.image_cache = image_cache
+        self.log = log or print
+        self.viewers = [None] * len(self.records)
+        self._canvases = []
+        self._pinned = []
+        self._closed = False
+        self._syncing = False
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"对比 {len(self.records)} 张图像")
+        self.window.geometry("1200x800")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        columns = math.ceil(math.sqrt(len(self.records)))
+        rows = math.ceil(len(self.records) / columns)
+        for column in range(columns):
+            self.window.columnconfigure(column, weight=1)
+        for row in range(rows):
+            self.window.rowconfigure(row, weight=1)
+
+        for index, record in enumerate(self.records):
+            pane = ttk.Frame(self.window)
+            pane.grid(row=index // columns, column=index % columns, sticky=tk.NSEW, padx=2, pady=2)
+            caption = f"{index + 1}. {os.path.basename(record.get('path', ''))}"
+            ttk.Label(pane, text=caption).pack(side=tk.TOP, anchor=tk.W)
+            canvas = tk.Canvas(pane, bg="white")
+            canvas.pack(fill=tk.BOTH, expand=True)
+            canvas.bind("<MouseWheel>", self._on_wheel)
+            canvas.bind("<Button-4>", self._on_wheel)  # Linux支持
+            canvas.bind("<Button-5>", self._on_wheel)  # Linux支持
+            self._canvases.append(canvas)
+
+            # 在后台解码并构建金字塔，完成后创建该窗格的查看器
+            decode_service.run(
+                pyramid_cache.get, record.get('path'),
+                callback=lambda pyramid, error, index=index: self._on_pyramid(index, pyramid, error))
+
+    def is_open(self):
+        return not self._closed
+
+    def close(self):
+        self._closed = True
+        for key in self._pinned:
+            self.image_cache.unpin(key)
+        self._pinned = []
+        self.window.destroy()
+
+    def _on_pyramid(self, index, pyramid, error):
+        if self._closed:
+            return
+        if error:
+            self.log(f"[错误] 对比图像 {index + 1} 加载失败: {str(error)}")
+            return
+        self.image_cache.pin(pyramid.key)
+        self._pinned.append(pyramid.key)
+
+        # 已有查看器时沿用其缩放和位置，否则按窗格大小适配整张图像
+        reference = self._reference_viewer()
+        canvas = self._canvases[index]
+        if reference is not None:
+            scale = reference.scale
+        else:
+            canvas.update_idletasks()
+            scale = min(max(1, canvas.winfo_width()) / pyramid.width,
+                        max(1, canvas.winfo_height()) / pyramid.height)
+        viewer = ZoomViewer(canvas, pyramid, scale=scale, on_pan=self._sync_pan)
+        self.viewers[index] = viewer
+        if reference is not None:
+            viewer.move_to(*reference.view_fractions())
+        else:
+            viewer.refresh()
+
+    def _reference_viewer(self):
+        for viewer in self.viewers:
+            if viewer is not None:
+                return viewer
+        return None
+
+    def _on_wheel(self, event):
+        """所有窗格以相同的鼠标位置同步缩放"""
+        factor = 1.1 if event.num == 4 or event.delta > 0 else 0.9
+        for viewer in self.viewers:
+            if viewer is not None:
+                viewer.zoom_by(factor, event.x, event.y)
+
+    def _sync_pan(self, source):
+        """某个窗格被滚动或拖动后，其余窗格移动到相同的相对位置"""
+        if self._syncing:
+            return
+        self._syncing = True
+        try:
+            fractions = source.view_fractions()
+            for viewer in self.viewers:
+                if viewer is not None and viewer is not source:
+                    viewer.move_to(*fractions)
+        finally:
+            self._syncing = False
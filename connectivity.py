@@ -0,0 +1,152 @@
+"""API连通性探测
+
+在后台线程中同时探测火山方舟和DeepSeek，使用不产生生成费用的最便宜的鉴权请求：
+- 方舟：向图像生成端点发送空请求体，鉴权先于参数校验，401/403表示密钥无效，400/422参数错误表示密钥有效
+- DeepSeek：列出模型（GET /models）
+
+结果按 (服务, 密钥) 缓存一段时间，生成任务执行前可直接查询密钥状态，不需要额外的网络请求。
+"""
+
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ARK_BASE_URL = "https://ark.cn-beijing.volces.com/api/v3"
+
+# 探测结果状态
+STATUS_OK = 'ok'
+STATUS_INVALID_KEY = 'invalid_key'
+STATUS_FORBIDDEN = 'forbidden'
+STATUS_UNKNOWN = 'unknown'    # 收到了响应，但状态码不能说明密钥是否有效
+STATUS_ERROR = 'error'        # 网络错误，没有收到响应
+
+# 鉴权通过后因请求体不完整被拒绝的状态码，探测请求不计费
+PROBE_REJECTED_CODES = (400, 422)
+
+SERVICE_NAMES = {'ark': "火山AI", 'deepseek': "DeepSeek"}
+
+
+def _result(status, message, started):
+    return {
+        'status': status,
+        'ok': status == STATUS_OK,
+        'message': message,
+        'latency': time.monotonic() - started,
+        'checked_at': time.time(),
+    }
+
+
+def classify_status_code(status_code):
+    """按HTTP状态码判断密钥状态，返回 (状态, 说明)
+
+    只有2xx和探测请求预期的参数错误（400/422）视为密钥有效；404等其他状态码多半是API地址或路径错误，
+    不能说明密钥是否有效。
+    """
+    if 200 <= status_code < 300 or status_code in PROBE_REJECTED_CODES:
+        return STATUS_OK, "API密钥有效"
+    if status_code == 401:
+        return STATUS_INVALID_KEY, "API密钥无效"
+    if status_code == 403:
+        return STATUS_FORBIDDEN, "访问被拒绝，请检查密钥权限"
+    if status_code == 429:
+        return STATUS_UNKNOWN, "请求被限流，暂时无法确认密钥状态"
+    if status_code >= 500:
+        return STATUS_UNKNOWN, f"服务暂时不可用（HTTP {status_code}）"
+    return STATUS_UNKNOWN, f"无法确认密钥状态（HTTP {status_code}），请检查API地址"
+
+
+def probe_ark(api_key, base_url=ARK_BASE_URL, timeout=15):
+    """探测火山方舟密钥：空请求体在参数校验阶段即被拒绝，不会生成图像"""
+    started = time.monotonic()
+    try:
+        response = requests.post(
+            f"{base_url}/images/generations",
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={},
+            timeout=timeout)
+    except requests.RequestException as e:
+        return _result(STATUS_ERROR, f"无法连接: {str(e)}", started)
+    status, message = classify_status_code(response.status_code)
+    return _result(status, message, started)
+
+
+def probe_deepseek(client):
+    """探测DeepSeek密钥：列出模型是最便宜的鉴权请求，不消耗token"""
+    started = time.monotonic()
+    try:
+        client.models.list()
+    except Exception as e:
+        status_code = getattr(e, 'status_code', None)
+        if status_code is None:
+            error_str = str(e).lower()
+            if "401" in error_str or "unauthorized" in error_str or "invalid api key" in error_str:
+                status_code = 401
+            elif "403" in error_str or "forbidden" in error_str:
+                status_code = 403
+        if status_code is None:
+            return _result(STATUS_ERROR, f"无法连接: {str(e)}", started)
+        status, message = classify_status_code(status_code)
+        return _result(status, message, started)
+    return _result(STATUS_OK, "API密钥有效", started)
+
+
+class ConnectivityChecker:
+    def __init__(self, ttl_seconds=300, log=None):
+        """初始化连通性探测器
+
+        Args:
+            ttl_seconds: 探测结果的有效期（秒）
+            log: 日志函数，参数为一条消息
+        """
+        self.ttl_seconds = ttl_seconds
+        self.log = log or print
+        self._lock = threading.Lock()
+        self._results = {}   # (服务, 密钥摘要) -> 探测结果
+
+    @staticmethod
+    def _key(service, api_key):
+        # 只保存密钥的摘要
+        return service, hashlib.sha1(api_key.encode('utf-8')).hexdigest()
+
+    def cached(self, service, api_key):
+        """返回未过期的探测结果，没有时返回None"""
+        with self._lock:
+            result = self._results.get(self._key(service, api_key))
+        if result is None or time.time() - result['checked_at'] > self.ttl_seconds:
+            return None
+        return result
+
+    def is_key_rejected(self, service, api_key):
+        """最近一次探测是否判定密钥无效或无权限；没有有效结果时返回False，不发起请求"""
+        result = self.cached(service, api_key)
+        return result is not None and result['status'] in (STATUS_INVALID_KEY, STATUS_FORBIDDEN)
+
+    def check(self, service, api_key, probe, force=False):
+        """返回密钥的探测结果，缓存有效时不发起请求
+
+        Args:
+            service: 服务名，如 'ark'、'deepseek'
+            api_key: API密钥
+            probe: 无参数的探测函数，返回探测结果字典
+            force: 忽略缓存重新探测
+        """
+        if not force:
+            result = self.cached(service, api_key)
+            if result is not None:
+                return result
+        result = probe()
+        with self._lock:
+            self._results[self._key(service, api_key)] = result
+        return result
+
+    def check_many(self, checks, force=False):
+        """同时探测多个服务，checks 为 {服务: (密钥, 探测函数)}，返回 {服务: 探测结果}"""
+        if not checks:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix='probe') as executor:
+            futures = {service: executor.submit(self.check, service, api_key, probe, force)
+                       for service, (api_key, probe) in checks.items()}
+            return {service: future.result() for service, future in futures.items()}
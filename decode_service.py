@@ -0,0 +1,97 @@
+"""图像解码服务
+
+所有PIL解码、缩放和格式转换都在后台线程池中完成，只把最终的小尺寸RGBA像素缓冲区
+通过 root.after 交回Tk线程，Tk线程只需用 frombuffer 包装后创建PhotoImage。
+这样同时解码多张4K图像时界面仍能保持响应。
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageTk
+
+
+class DecodedImage:
+    """解码完成的RGBA像素缓冲区"""
+
+    def __init__(self, size, data, key=None):
+        self.size = size
+        self.data = data
+        # 图像缓存中的键，由此派生的PhotoImage可按该键共享
+        self.key = key
+
+    @property
+    def width(self):
+        return self.size[0]
+
+    @property
+    def height(self):
+        return self.size[1]
+
+    @property
+    def nbytes(self):
+        return len(self.data)
+
+    @classmethod
+    def from_image(cls, image):
+        """在后台线程中把PIL图像转换为RGBA缓冲区"""
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        return cls(image.size, image.tobytes())
+
+    def to_image(self):
+        """零拷贝包装为PIL图像"""
+        return Image.frombuffer('RGBA', self.size, self.data, 'raw', 'RGBA', 0, 1)
+
+
+def to_photo_image(decoded):
+    """在Tk线程中由RGBA缓冲区创建PhotoImage"""
+    return ImageTk.PhotoImage(decoded.to_image())
+
+
+def cached_photo_image(image_cache, decoded):
+    """在Tk线程中获取decoded对应的PhotoImage，返回 (photo, 缓存键)
+
+    decoded带有缓存键时PhotoImage通过图像缓存共享，调用方显示期间应固定该键；
+    没有键时（如流式预览）直接创建，键为None。
+    """
+    if decoded.key is None:
+        return to_photo_image(decoded), None
+    key = ('photo',) + tuple(decoded.key)
+    photo = image_cache.get(key)
+    if photo is None:
+        photo = image_cache.put(key, to_photo_image(decoded), decoded.nbytes)
+    return photo, key
+
+
+class DecodeService:
+    def __init__(self, root, max_workers=2):
+        """初始化解码服务
+
+        Args:
+            root: Tk根窗口，结果通过 root.after 回到Tk线程
+            max_workers: 后台解码线程数
+        """
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='decode')
+
+    def run(self, func, *args, callback=None):
+        """在后台线程执行func(*args)，callback(result, error) 在Tk线程中调用"""
+        def task():
+            try:
+                result = func(*args)
+            except Exception as e:
+                if callback:
+                    self.root.after(0, lambda error=e: callback(None, error))
+                return
+            if callback:
+                self.root.after(0, lambda: callback(result, None))
+        return self._executor.submit(task)
+
+    def decode(self, func, *args, callback=None):
+        """在后台线程执行返回PIL图像的func(*args)并转换为DecodedImage，
+        callback(decoded, error) 在Tk线程中调用"""
+        return self.run(lambda: DecodedImage.from_image(func(*args)), callback=callback)
+
+    def shutdown(self):
+        """停止后台解码线程"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
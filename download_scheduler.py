@@ -0,0 +1,202 @@
+"""结果URL下载调度器
+
+火山方舟返回的图像URL是带签名的临时链接（如 X-Tos-Date + X-Tos-Expires），
+过期后无法再下载。调度器从URL的签名参数中解析过期时间，按截止时间先后下载；
+即将过期的URL较多时临时增加下载线程，URL在下载前已过期时发出告警。
+"""
+
+import time
+import heapq
+import threading
+import calendar
+from datetime import datetime
+from urllib.parse import urlparse, parse_qsl
+
+from resumable_download import download_file
+
+
+def parse_url_expiry(url):
+    """从签名URL的查询参数中解析过期时间（Unix时间戳），无法解析时返回None"""
+    try:
+        query = {k.lower(): v for k, v in parse_qsl(urlparse(url).query)}
+    except Exception:
+        return None
+
+    # TOS / S3 风格签名：签名时间 + 有效秒数
+    for prefix in ('x-tos-', 'x-amz-'):
+        date_value = query.get(prefix + 'date')
+        expires_value = query.get(prefix + 'expires')
+        if date_value and expires_value:
+            try:
+                signed_at = datetime.strptime(date_value, '%Y%m%dT%H%M%SZ')
+                return calendar.timegm(signed_at.timetuple()) + int(expires_value)
+            except ValueError:
+                continue
+
+    # 其他风格：Expires 直接给出过期时间戳
+    expires_value = query.get('expires')
+    if expires_value and expires_value.isdigit():
+        return int(expires_value)
+    return None
+
+
+class DownloadTask:
+    def __init__(self, url, dest_path, deadline, on_complete=None, on_error=None):
+        self.url = url
+        self.dest_path = dest_path
+        self.deadline = deadline
+        self.on_complete = on_complete
+        self.on_error = on_error
+
+
+class DownloadScheduler:
+    def __init__(self, min_workers=2, max_workers=6, urgent_seconds=600,
+                 urgent_per_worker=2, default_ttl=3600, on_alert=None, log=None):
+        """初始化下载调度器
+
+        Args:
+            min_workers: 常驻下载线程数
+            max_workers: 最大下载线程数
+            urgent_seconds: 距离过期不足该秒数的URL视为紧急
+            urgent_per_worker: 每出现多少个紧急URL增加一个下载线程
+            default_ttl: 无法解析过期时间时假定的有效期（秒）
+            on_alert: URL在下载前已过期时的回调，参数为DownloadTask
+            log: 日志函数，参数为一条消息
+        """
+        self.min_workers = max(1, min_workers)
+        self.max_workers = max(self.min_workers, max_workers)
+        self.urgent_seconds = urgent_seconds
+        self.urgent_per_worker = max(1, urgent_per_worker)
+        self.default_ttl = default_ttl
+        self.on_alert = on_alert
+        self.log = log or print
+
+        self._heap = []
+        self._seq = 0
+        self._workers = 0
+        self._busy = 0
+        self._shutdown = False
+        self._cond = threading.Condition()
+
+    def submit(self, url, dest_path, on_complete=None, on_error=None):
+        """提交下载任务，按URL过期时间排队
+
+        on_complete(task) 在下载完成后于下载线程中调用；
+        on_error(task, error) 在下载失败或URL过期时调用。
+        """
+        deadline = parse_url_expiry(url)
+        if deadline is None:
+            deadline = time.time() + self.default_ttl
+        task = DownloadTask(url, dest_path, deadline, on_complete, on_error)
+
+        with self._cond:
+            heapq.heappush(self._heap, (deadline, self._seq, task))
+            self._seq += 1
+            self._adjust_workers_locked()
+            self._cond.notify()
+        return task
+
+    def pending_count(self):
+        """排队中的任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def shutdown(self):
+        """停止调度，排队中的任务不再下载"""
+        with self._cond:
+            self._shutdown = True
+            self._heap.clear()
+            self._cond.notify_all()
+
+    def _target_workers_locked(self):
+        """根据紧急URL数量计算目标下载线程数"""
+        cutoff = time.time() + self.urgent_seconds
+        urgent = sum(1 for deadline, _, _ in self._heap if deadline <= cutoff)
+        extra = (urgent + self.urgent_per_worker - 1) // self.urgent_per_worker
+        return min(self.max_workers, self.min_workers + extra)
+
+    def _adjust_workers_locked(self):
+        """按需启动新的下载线程"""
+        target = self._target_workers_locked()
+        # 空闲线程足以处理排队任务时无需新建
+        idle = self._workers - self._busy
+        while self._workers < target and idle < len(self._heap):
+            self._workers += 1
+            idle += 1
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+
+    def _pop_task_locked(self):
+        """取出截止时间最早且尚未过期的任务，过期任务触发告警"""
+        while self._heap:
+            deadline, _, task = heapq.heappop(self._heap)
+            if deadline > time.time():
+                return task
+            self._report_expired(task)
+        return None
+
+    def _report_expired(self, task):
+        """报告URL在下载前已过期；设置了 on_alert 时由回调负责记录，避免重复日志"""
+        if not self.on_alert:
+            self.log(f"[告警] 图像URL已过期，未能下载: {task.url}")
+        else:
+            try:
+                self.on_alert(task)
+            except Exception as e:
+                self.log(f"[错误] 过期告警回调失败: {str(e)}")
+        if task.on_error:
+            try:
+                task.on_error(task, RuntimeError("URL已过期"))
+            except Exception:
+                pass
+
+    def _worker(self):
+        """下载线程主循环，空闲且超出目标线程数时退出"""
+        while True:
+            with self._cond:
+                task = None
+                while not self._shutdown:
+                    task = self._pop_task_locked()
+                    if task is not None:
+                        break
+                    if self._workers > self.min_workers:
+                        break
+                    self._cond.wait(timeout=5)
+                if task is None:
+                    self._workers -= 1
+                    return
+                self._busy += 1
+                # 剩余任务中紧急URL较多时增加下载线程
+                self._adjust_workers_locked()
+
+            try:
+                self._download(task)
+            finally:
+                with self._cond:
+                    self._busy -= 1
+                    if self._workers > self._target_workers_locked() and not self._heap:
+                        self._workers -= 1
+                        return
+
+    def _download(self, task):
+        """下载单个任务到目标路径"""
+        try:
+            # 断点续传并校验长度和内容哈希
+            download_file(task.url, task.dest_path, log=self.log)
+        except Exception as e:
+            if getattr(e, 'status_code', None) == 403 and time.time() >= task.deadline:
+                self._report_expired(task)
+                return
+            self.log(f"[错误] 下载图像失败: {str(e)} ({task.url})")
+            if task.on_error:
+                try:
+                    task.on_error(task, e)
+                except Exception:
+                    pass
+            return
+
+        if task.on_complete:
+            try:
+                task.on_complete(task)
+            except Exception as e:
+                self.log(f"[错误] 下载完成回调失败: {str(e)}")
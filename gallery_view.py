@@ -0,0 +1,221 @@
+"""图库窗口
+
+以网格形式浏览输出存储中的所有生成图像。网格是虚拟化的：只为可见区域内的单元格创建画布项，
+缩略图由缩略图服务在后台线程中生成，单元格的PhotoImage在图像缓存中固定，移出可见区域后才可被淘汰。同一组的图像（组图任务或提示词变体）排在一起，新图像插入到所属组的末尾，
+浏览数千张图像时也能保持流畅。
+"""
+
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from decode_service import cached_photo_image
+from output_store import group_key
+
+# 单元格尺寸和缩略图尺寸（像素）
+CELL_WIDTH = 170
+CELL_HEIGHT = 190
+THUMB_SIZE = (150, 150)
+
+
+def order_by_group(records):
+    """把同组的记录排在一起，组按首次出现的顺序排列，组内保持原顺序"""
+    order = {}
+    for record in records:
+        order.setdefault(group_key(record), len(order))
+    return sorted(records, key=lambda record: order[group_key(record)])
+
+
+class GalleryView:
+    def __init__(self, parent, records, thumbnail_service, image_cache, on_select=None, on_open=None):
+        """创建图库窗口
+
+        Args:
+            parent: 父窗口
+            records: 输出存储中的图像记录列表（需包含 path）
+            thumbnail_service: ThumbnailService
+            image_cache: ImageCache，共享单元格的PhotoImage
+            on_select: 单击图像时的回调，参数为记录
+            on_open: 双击图像时的回调，参数为记录
+        """
+        self.thumbnail_service = thumbnail_service
+        self.image_cache = image_cache
+        self.on_select = on_select
+        self.on_open = on_open
+        self.records = order_by_group(records)
+        self._cells = {}      # 记录索引 -> 单元格信息
+        self._columns = 0
+
+        self.window = tk.Toplevel(parent)
+        self.window.title("图库")
+        self.window.geometry("900x650")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.count_label = ttk.Label(self.window)
+        self.count_label.pack(side=tk.TOP, anchor=tk.W, padx=10, pady=(5, 0))
+
+        frame = ttk.Frame(self.window)
+        frame.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(frame, bg="white", yscrollincrement=CELL_HEIGHT // 4)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self._yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", self._on_wheel)  # Linux支持
+        self.canvas.bind("<Button-5>", self._on_wheel)  # Linux支持
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self._update_count()
+
+    def is_open(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def close(self):
+        for index in list(self._cells):
+            self._remove_cell(index)
+        self.window.destroy()
+
+    def add_record(self, record):
+        """插入一张新完成的图像到所属组的末尾"""
+        key = group_key(record)
+        position = len(self.records)
+        for index in range(len(self.records) - 1, -1, -1):
+            if group_key(self.records[index]) == key:
+                position = index + 1
+                break
+        self.records.insert(position, record)
+        # 插入点之后的图像都后移了一格，对应的单元格需要重建
+        for index in [index for index in self._cells if index >= position]:
+            self._remove_cell(index)
+        self._update_count()
+        self._update_scrollregion()
+        self.refresh()
+
+    def _update_count(self):
+        self.count_label.config(text=f"共 {len(self.records)} 张图像")
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self.refresh()
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.canvas.yview_scroll(-1, "units")
+        else:
+            self.canvas.yview_scroll(1, "units")
+        self.refresh()
+
+    def _on_configure(self, event=None):
+        columns = max(1, self.canvas.winfo_width() // CELL_WIDTH)
+        if columns != self._columns:
+            # 列数变化时所有单元格位置都要重新计算
+            self._columns = columns
+            self._clear_cells()
+        self._update_scrollregion()
+        self.refresh()
+
+    def _update_scrollregion(self):
+        columns = max(1, self._columns)
+        rows = (len(self.records) + columns - 1) // columns
+        self.canvas.config(scrollregion=(0, 0, columns * CELL_WIDTH, max(1, rows * CELL_HEIGHT)))
+
+    def _clear_cells(self):
+        for index in list(self._cells):
+            self._remove_cell(index)
+
+    def _remove_cell(self, index):
+        """删除单元格的画布项，并取消其PhotoImage的固定"""
+        cell = self._cells.pop(index)
+        for item in cell['items']:
+            self.canvas.delete(item)
+        if cell['photo_key'] is not None:
+            self.image_cache.unpin(cell['photo_key'])
+
+    def _visible_range(self):
+        """可见区域覆盖的记录索引范围 [first, last)，前后各多保留一行"""
+        columns = max(1, self._columns)
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // CELL_HEIGHT) - 1)
+        last_row = int(bottom // CELL_HEIGHT) + 1
+        return first_row * columns, min(len(self.records), (last_row + 1) * columns)
+
+    def refresh(self):
+        """为可见的记录创建单元格，删除移出可见区域的单元格"""
+        if not self._columns:
+            return
+        first, last = self._visible_range()
+        for index in list(self._cells):
+            if not first <= index < last:
+                self._remove_cell(index)
+        for index in range(first, last):
+            if index not in self._cells:
+                self._create_cell(index)
+
+    def _create_cell(self, index):
+        record = self.records[index]
+        column = index % self._columns
+        row = index // self._columns
+        x = column * CELL_WIDTH
+        y = row * CELL_HEIGHT
+        center_x = x + CELL_WIDTH // 2
+
+        frame_item = self.canvas.create_rectangle(x + 5, y + 5, x + CELL_WIDTH - 5, y + THUMB_SIZE[1] + 15,
+                                                  outline="#dddddd")
+        image_item = self.canvas.create_image(center_x, y + 10 + THUMB_SIZE[1] // 2, anchor=tk.CENTER)
+        caption = record.get('prompt') or os.path.basename(record.get('path', ''))
+        if record.get('variant_group'):
+            caption = f"变体{record.get('variant_index', 0) + 1}/{record.get('variant_count', 1)} {caption}"
+        text_item = self.canvas.create_text(center_x, y + THUMB_SIZE[1] + 28, text=caption[:20],
+                                            width=CELL_WIDTH - 10, fill="gray")
+        path = record.get('path')
+        self._cells[index] = {'items': (frame_item, image_item, text_item), 'image': image_item,
+                              'path': path, 'photo': None, 'photo_key': None}
+
+        # 单元格必须先登记，内存缓存命中时回调会同步执行
+        self.thumbnail_service.request(
+            path, THUMB_SIZE,
+            lambda decoded, error: self._set_thumbnail(index, path, decoded, error))
+
+    def _set_thumbnail(self, index, path, decoded, error):
+        """缩略图就绪后显示，单元格已移出可见区域时丢弃"""
+        cell = self._cells.get(index)
+        if cell is None or cell['path'] != path or error or decoded is None or not self.is_open():
+            return
+        photo, key = cached_photo_image(self.image_cache, decoded)
+        if key is not None:
+            self.image_cache.pin(key)
+        if cell['photo_key'] is not None:
+            self.image_cache.unpin(cell['photo_key'])
+        self.canvas.itemconfig(cell['image'], image=photo)
+        cell['photo'] = photo  # 保持引用防止被垃圾回收
+        cell['photo_key'] = key
+
+    def _record_at(self, event):
+        if not self._columns:
+            return None
+        x = self.canvas.canvasx(event.x)
+        y = self.canvas.canvasy(event.y)
+        column = int(x // CELL_WIDTH)
+        if column >= self._columns:
+            return None
+        index = int(y // CELL_HEIGHT) * self._columns + column
+        if 0 <= index < len(self.records):
+            return self.records[index]
+        return None
+
+    def _on_click(self, event):
+        record = self._record_at(event)
+        if record and self.on_select:
+            self.on_select(record)
+
+    def _on_double_click(self, event):
+        record = self._record_at(event)
+        if record and self.on_open:
+            self.on_open(record)
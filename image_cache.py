@@ -0,0 +1,100 @@
+"""图像内存缓存
+
+缩略图缓冲区、金字塔和PhotoImage统一放在一个按字节预算限制的缓存中。每个条目记录解码后的大小，
+超出预算时按LRU顺序淘汰；正在显示的条目被固定（pin），不会被淘汰。
+长时间使用、浏览大量图像后内存占用仍然可控。
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class ImageCache:
+    def __init__(self, byte_budget, release=None):
+        """初始化图像缓存
+
+        Args:
+            byte_budget: 缓存总字节数上限（固定的条目不受限制）
+            release: 可选，参数为被淘汰的值列表。PhotoImage必须在Tk线程中释放，
+                由此回调把最后的引用交回Tk线程
+        """
+        self.byte_budget = byte_budget
+        self.release = release
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # 键 -> (值, 字节数)
+        self._pins = {}                 # 键 -> 固定次数
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key):
+        """获取缓存的值并标记为最近使用，未缓存时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        """加入或替换条目，必要时淘汰最久未使用的未固定条目，返回value"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._total_bytes += nbytes
+            evicted = self._evict_locked()
+        self._release(evicted)
+        return value
+
+    def pin(self, key):
+        """固定条目（正在显示），固定期间不会被淘汰。可多次固定，需对应次数的unpin"""
+        with self._lock:
+            self._pins[key] = self._pins.get(key, 0) + 1
+
+    def unpin(self, key):
+        """取消一次固定，之后若超出预算则立即淘汰"""
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+            else:
+                self._pins.pop(key, None)
+            evicted = self._evict_locked()
+        self._release(evicted)
+
+    def discard(self, key):
+        """移除条目"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+        if entry is not None:
+            self._release([entry[0]])
+
+    def _evict_locked(self):
+        """按LRU顺序淘汰未固定的条目直到不超出预算，返回被淘汰的值"""
+        evicted = []
+        if self._total_bytes <= self.byte_budget:
+            return evicted
+        for key in list(self._entries):
+            if self._total_bytes <= self.byte_budget:
+                break
+            if key in self._pins:
+                continue
+            value, nbytes = self._entries.pop(key)
+            self._total_bytes -= nbytes
+            evicted.append(value)
+        return evicted
+
+    def _release(self, values):
+        if values and self.release:
+            self.release(values)
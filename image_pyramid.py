@@ -0,0 +1,90 @@
+"""图像金字塔与渲染缓存
+
+放大预览窗口只解码一次原图，并预先生成逐级减半的金字塔层级。
+任意缩放比例都从不小于目标尺寸的最近层级缩放，缩小显示时不必每次都对整张4K原图做LANCZOS。
+金字塔放在共享的图像缓存中，按所有层级的解码大小计入字节预算。
+"""
+
+import os
+
+from PIL import Image
+
+# 金字塔最小层级的最长边
+MIN_LEVEL_SIDE = 256
+
+
+class ImagePyramid:
+    def __init__(self, image):
+        """由已解码的图像构建金字塔，第0层为原图，之后每层边长减半"""
+        # 图像缓存中的键，由 PyramidCache 设置，显示期间用于固定
+        self.key = None
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        self.levels = [image]
+        level = image
+        while max(level.size) // 2 >= MIN_LEVEL_SIDE:
+            # reduce 使用盒式滤波，2倍缩小时质量足够且远快于LANCZOS
+            level = level.reduce(2)
+            self.levels.append(level)
+
+    @classmethod
+    def from_path(cls, path):
+        """解码图像文件并构建金字塔"""
+        with Image.open(path) as image:
+            image.load()
+            # 关闭文件后原图像对象不再可用，需要副本
+            return cls(image.copy() if image.mode in ('RGB', 'RGBA', 'L') else image.convert('RGBA'))
+
+    @property
+    def width(self):
+        return self.levels[0].width
+
+    @property
+    def height(self):
+        return self.levels[0].height
+
+    @property
+    def nbytes(self):
+        """所有层级解码后占用的字节数"""
+        return sum(level.width * level.height * len(level.getbands()) for level in self.levels)
+
+    def level_for_scale(self, scale):
+        """返回不小于目标尺寸的最小层级及该层级相对原图的比例"""
+        index = 0
+        while index + 1 < len(self.levels) and 1.0 / (2 ** (index + 1)) >= scale:
+            index += 1
+        level = self.levels[index]
+        return level, level.width / self.width
+
+    def scaled_size(self, scale):
+        return max(1, round(self.width * scale)), max(1, round(self.height * scale))
+
+    def render(self, scale, resample=Image.LANCZOS):
+        """按比例渲染整张图像"""
+        level, _ = self.level_for_scale(scale)
+        size = self.scaled_size(scale)
+        if level.size == size:
+            return level
+        return level.resize(size, resample)
+
+
+class PyramidCache:
+    def __init__(self, image_cache):
+        """按文件缓存已构建的金字塔，多个窗口共享同一份解码结果
+
+        Args:
+            image_cache: ImageCache，显示中的金字塔应通过 pyramid.key 固定
+        """
+        self.image_cache = image_cache
+
+    def get(self, path):
+        """获取图像的金字塔，未缓存时解码并构建"""
+        stat = os.stat(path)
+        key = ('pyramid', os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        pyramid = self.image_cache.get(key)
+        if pyramid is not None:
+            return pyramid
+
+        pyramid = ImagePyramid.from_path(path)
+        pyramid.key = key
+        return self.image_cache.put(key, pyramid, pyramid.nbytes)
@@ -0,0 +1,93 @@
+"""图像生成任务队列
+
+生成参数在Tk线程中取好后作为普通字典提交到有界队列，由固定数量的工作线程依次执行。
+队列满时，批量提交方（如优化-生成流水线）会阻塞等待，形成上下游之间的背压；
+界面上的单次提交则不等待，直接提示队列已满。
+"""
+
+import queue
+import threading
+
+# 停止工作线程的标记
+_STOP = object()
+
+
+class GenerationJobQueue:
+    def __init__(self, run_job, workers=2, max_pending=4, log=None):
+        """初始化任务队列
+
+        Args:
+            run_job: 在工作线程中执行一个任务的函数，参数为任务字典
+            workers: 工作线程数（同时进行的生成请求数）
+            max_pending: 排队等待的任务数上限
+            log: 日志函数，参数为一条消息
+        """
+        self.run_job = run_job
+        self.log = log or print
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._threads = []
+        for index in range(workers):
+            thread = threading.Thread(target=self._worker, name=f'generate-{index}')
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job, block=True, timeout=None):
+        """提交任务，队列满时按 block/timeout 等待，仍然满则返回False"""
+        try:
+            self._queue.put(job, block=block, timeout=timeout)
+        except queue.Full:
+            return False
+        return True
+
+    def pending_count(self):
+        """排队中尚未开始的任务数"""
+        return self._queue.qsize()
+
+    def running_count(self):
+        """正在执行的任务数"""
+        with self._lock:
+            return self._running
+
+    def cancel_pending(self):
+        """丢弃排队中尚未开始的任务，返回丢弃的数量"""
+        dropped = 0
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return dropped
+            self._queue.task_done()
+            dropped += 1
+
+    def join(self):
+        """等待所有已提交的任务完成"""
+        self._queue.join()
+
+    def shutdown(self):
+        """丢弃排队的任务并停止工作线程（不等待正在执行的任务）"""
+        self.cancel_pending()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(_STOP)
+            except queue.Full:
+                break
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            if job is _STOP:
+                self._queue.task_done()
+                return
+            with self._lock:
+                self._running += 1
+            try:
+                self.run_job(job)
+            except Exception as e:
+                self.log(f"[异常] 生成任务执行失败: {str(e)}")
+            finally:
+                with self._lock:
+                    self._running -= 1
+                self._queue.task_done()
@@ -1,17 +1,41 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
-import requests
 import json
 import threading
-from PIL import Image, ImageTk
+from PIL import Image
 import os
+import io
 import base64
 from urllib.parse import urlparse
 import sys
 import re
+import multiprocessing
+import queue
+import importlib.util
 
 # 导入升级检查器
 from update_checker import UpdateChecker
+from app_settings import load_settings, data_path
+from output_store import OutputStore
+from download_scheduler import DownloadScheduler
+from postprocess import PostProcessor, image_metadata, supported_save_filetypes
+from status_console import StatusConsole, LEVEL_FILTERS
+from decode_service import DecodeService, DecodedImage, cached_photo_image
+from image_cache import ImageCache
+from thumbnail_service import ThumbnailService
+from image_pyramid import PyramidCache
+from zoom_viewer import ZoomViewer
+from gallery_view import GalleryView
+from compare_view import CompareView
+from prompt_optimizer import stream_optimize_prompt, optimize_prompt_variants, OptimizationCancelled
+from prompt_cache import PromptOptimizationCache
+from batch_optimizer import AsyncBatchOptimizer, BatchOptimizer, default_output_path, read_prompt_file
+from job_queue import GenerationJobQueue
+from pipeline import OptimizeGeneratePipeline
+from sweep import load_sweep, expand_sweep, sweep_size
+from near_dedup import dedupe_prompts
+from connectivity import ConnectivityChecker, SERVICE_NAMES, probe_ark, probe_deepseek
+from usage_tracker import UsageTracker, TOTAL_FIELDS
 
 def resource_path(relative_path):
     """获取资源文件的绝对路径"""
@@ -34,10 +58,25 @@ except ImportError:
     HAS_ARK_SDK = False
     print("警告: 未找到火山AI SDK，请安装 'volcengine-python-sdk[ark]'")
 
+# 预览区域最大尺寸
+PREVIEW_MAX_SIZE = (400, 300)
+# 流式部分图像的最短重绘间隔（毫秒），约等于60Hz显示刷新周期
+PARTIAL_PREVIEW_INTERVAL_MS = 16
+# 状态日志的批量写入间隔（毫秒）和每批最多写入的行数
+STATUS_FLUSH_INTERVAL_MS = 50
+STATUS_FLUSH_MAX_LINES = 500
+# 流式提示词优化写入输入框的最短间隔（毫秒）
+PROMPT_STREAM_INTERVAL_MS = 50
+# 下载过期告警的合并等待时间（毫秒），期间过期的URL汇总到一个提示框中
+EXPIRED_ALERT_DELAY_MS = 1000
+
 class VolcanoImageGenerator:
     def __init__(self, root):
         self.root = root
         
+        # 状态日志队列：任意线程写入，Tk线程定时批量取出显示
+        self._status_queue = queue.SimpleQueue()
+        
         # 初始化版本号为默认值
         default_version = "1.3"
         email = "邮箱ozxuu@outlook.com"
@@ -92,14 +131,100 @@ class VolcanoImageGenerator:
         self.image_path = tk.StringVar()
         self.reference_images = []
         
-        # 当前显示的图像路径
+        # 当前显示的图像路径及其任务信息
         self.current_image_path = None
+        self.current_image_record = None
+        self._display_request = None
+        
+        # 流式部分图像预览：工作线程写入最新一帧，Tk线程按刷新间隔取出显示
+        self._partial_preview_lock = threading.Lock()
+        self._pending_partial_preview = None
+        self._partial_preview_scheduled = False
+        
+        # 流式提示词优化：工作线程追加文本片段，Tk线程按刷新间隔合并写入输入框
+        self._prompt_stream_lock = threading.Lock()
+        self._pending_prompt_deltas = []
+        self._prompt_stream_scheduled = False
+        
+        # 下载前已过期的图像URL：下载线程追加，Tk线程合并后只弹出一个提示框
+        self._expired_lock = threading.Lock()
+        self._expired_urls = []
+        self._expired_alert_scheduled = False
+        self._optimize_cancel = None          # 进行中的优化的取消事件
+        self._optimize_original_prompt = ""
+        self._optimize_stream_started = False
+        
+        # 应用设置
+        self.settings = load_settings()
+        
+        # 输出图像存储和下载调度器
+        self.output_store = OutputStore(data_path('outputs'))
+        # 每次请求的用量记录在输出目录的 usage.jsonl 中，按 job_id 对应任务历史
+        self.usage_tracker = UsageTracker(os.path.join(self.output_store.root_dir, 'usage.jsonl'),
+                                          log=self.update_status)
+        self.download_scheduler = DownloadScheduler(
+            min_workers=self.settings["download_min_workers"],
+            max_workers=self.settings["download_max_workers"],
+            urgent_seconds=self.settings["download_urgent_seconds"],
+            urgent_per_worker=self.settings["download_urgent_per_worker"],
+            default_ttl=self.settings["download_default_ttl"],
+            on_alert=self.on_download_expired,
+            log=self.update_status
+        )
+        
+        # 后处理进程池：格式转换、元数据写入、缩小版本
+        self.post_processor = PostProcessor(max_workers=self.settings["postprocess_workers"])
+        self.save_quality = tk.IntVar(value=self.settings["save_quality"])
+        
+        # 图像内存缓存：缩略图、金字塔和PhotoImage共用一个字节预算，正在显示的条目被固定
+        # 被淘汰的PhotoImage交回Tk线程释放
+        self.image_cache = ImageCache(
+            self.settings["image_cache_mb"] * 1024 * 1024,
+            release=lambda values: self.root.after(0, values.clear))
+        
+        # 解码服务：所有PIL解码都在后台线程池中完成
+        self.decode_service = DecodeService(self.root)
+        
+        # 缩略图服务：后台低分辨率解码，按内容哈希缓存
+        self.thumbnail_service = ThumbnailService(
+            self.decode_service, self.image_cache, data_path('cache', 'thumbnails'),
+            log=self.update_status)
+        
+        # 放大预览的图像金字塔缓存，每张图像只解码一次
+        self.pyramid_cache = PyramidCache(self.image_cache)
+        
+        # 提示词优化结果缓存
+        self.prompt_cache = PromptOptimizationCache(
+            data_path('cache', 'prompt_optimizations.json'),
+            ttl_seconds=self.settings["prompt_cache_ttl"],
+            max_entries=self.settings["prompt_cache_max_entries"],
+            log=self.update_status)
+        self.force_new_optimization = tk.BooleanVar(value=False)
+        self.variant_count = tk.IntVar(value=1)   # 大于1时生成多个变体并分别出图
+        self._batch_cancel = None   # 进行中的批量优化、流水线或参数扫描的取消事件
+        
+        # API连通性探测结果缓存，生成任务执行前据此检查密钥
+        self.connectivity = ConnectivityChecker(
+            ttl_seconds=self.settings["connectivity_ttl"], log=self.update_status)
+        
+        # 生成任务队列：参数在Tk线程中取好，生成请求在工作线程中执行
+        self.job_queue = GenerationJobQueue(
+            self._run_generation_job,
+            workers=self.settings["generation_workers"],
+            max_pending=self.settings["generation_queue_size"],
+            log=self.update_status)
+        
+        # 图库窗口（打开后才创建）
+        self.gallery_view = None
         
         # 初始化升级检查器
         self.update_checker = UpdateChecker(self.root, self)
         
         self.setup_ui()
         
+        # 开始定时刷新状态日志
+        self._drain_status_queue()
+        
     def create_menu(self):
         """创建菜单栏"""
         self.menu_bar = tk.Menu(self.root)
@@ -107,11 +232,24 @@ class VolcanoImageGenerator:
         
         # 创建文件菜单
         file_menu = tk.Menu(self.menu_bar, tearoff=0)
+        file_menu.add_command(label="批量优化提示词...", command=self.batch_optimize_prompts)
+        file_menu.add_command(label="批量优化并生成...", command=self.run_optimize_generate_pipeline)
+        file_menu.add_command(label="参数扫描...", command=self.run_sweep)
+        file_menu.add_command(label="取消批量任务", command=self.cancel_batch)
+        file_menu.add_separator()
         file_menu.add_command(label="退出", command=self.root.quit)
         self.menu_bar.add_cascade(label="文件", menu=file_menu)
         
+        # 创建查看菜单
+        view_menu = tk.Menu(self.menu_bar, tearoff=0)
+        view_menu.add_command(label="图库", command=self.open_gallery)
+        view_menu.add_command(label="对比最近组图", command=self.open_compare_view)
+        view_menu.add_command(label="用量统计", command=self.show_usage_summary)
+        self.menu_bar.add_cascade(label="查看", menu=view_menu)
+        
         # 创建帮助菜单
         help_menu = tk.Menu(self.menu_bar, tearoff=0)
+        help_menu.add_command(label="测试全部连接", command=self.test_all_connectivity)
         self.menu_bar.add_cascade(label="帮助", menu=help_menu)
         
     def add_context_menu(self, widget):
@@ -206,6 +344,17 @@ class VolcanoImageGenerator:
         self.status_text.config(height=self.status_text_height)
         self.update_status(f"[信息] 状态栏已缩小，当前高度: {self.status_text_height}")
         
+    def on_status_level_change(self, event=None):
+        """按级别过滤状态信息"""
+        self.status_console.set_filter(LEVEL_FILTERS.get(self.status_level.get()))
+        
+    def search_status(self):
+        """在状态信息中搜索关键字"""
+        keyword = self.status_search.get().strip()
+        count = self.status_console.search(keyword)
+        if keyword and count == 0:
+            self.update_status(f"[信息] 未找到: {keyword}")
+        
     def setup_ui(self):
         # 主框架
         main_frame = ttk.Frame(self.root, padding="10")
@@ -299,6 +448,15 @@ class VolcanoImageGenerator:
         # 添加优化提示词按钮
         ttk.Button(params_frame, text="使用AI优化提示词", command=self.optimize_prompt_with_ai).grid(
             row=3, column=0, sticky=tk.W, padx=(0, 5), pady=(0, 10))
+        ttk.Checkbutton(params_frame, text="强制重新优化（忽略缓存）", variable=self.force_new_optimization).grid(
+            row=3, column=1, sticky=tk.W, pady=(0, 10))
+        self.cancel_optimize_button = ttk.Button(params_frame, text="取消优化", state=tk.DISABLED,
+                                                 command=self.cancel_prompt_optimization)
+        self.cancel_optimize_button.grid(row=3, column=2, sticky=tk.W, pady=(0, 10))
+        variant_frame = ttk.Frame(params_frame)
+        variant_frame.grid(row=3, column=3, sticky=tk.W, pady=(0, 10))
+        ttk.Label(variant_frame, text="变体数:").pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Spinbox(variant_frame, from_=1, to=10, textvariable=self.variant_count, width=5).pack(side=tk.LEFT)
         
         # 尺寸选择
         ttk.Label(params_frame, text="尺寸:").grid(row=4, column=0, sticky=tk.W, padx=(0, 5))
@@ -382,6 +540,10 @@ class VolcanoImageGenerator:
         
         ttk.Button(button_frame, text="生成图像", command=self.generate_image).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="保存图像", command=self.save_image).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="图库", command=self.open_gallery).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(button_frame, text="对比", command=self.open_compare_view).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Label(button_frame, text="保存质量:").pack(side=tk.LEFT, padx=(10, 5))
+        ttk.Spinbox(button_frame, from_=50, to=100, textvariable=self.save_quality, width=5).pack(side=tk.LEFT)
         
         # 状态区域
         status_frame = ttk.LabelFrame(main_frame, text="状态", padding="10")
@@ -406,9 +568,32 @@ class VolcanoImageGenerator:
         ttk.Button(resize_frame, text="↑ 扩大", command=self.expand_status).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(resize_frame, text="↓ 缩小", command=self.shrink_status).pack(side=tk.LEFT)
         
+        # 级别过滤和搜索
+        ttk.Label(resize_frame, text="级别:").pack(side=tk.LEFT, padx=(15, 5))
+        self.status_level = tk.StringVar(value="全部")
+        level_combo = ttk.Combobox(resize_frame, textvariable=self.status_level,
+                                   values=list(LEVEL_FILTERS.keys()), state="readonly", width=6)
+        level_combo.pack(side=tk.LEFT)
+        level_combo.bind("<<ComboboxSelected>>", self.on_status_level_change)
+        
+        self.status_search = tk.StringVar()
+        search_entry = ttk.Entry(resize_frame, textvariable=self.status_search, width=20)
+        search_entry.pack(side=tk.LEFT, padx=(15, 5))
+        search_entry.bind("<Return>", lambda event: self.search_status())
+        ttk.Button(resize_frame, text="搜索", command=self.search_status).pack(side=tk.LEFT)
+        
         # 初始化状态文本高度
         self.status_text_height = 8
         
+        # 有界状态控制台：只保留最近的行，更早的行写入日志文件
+        self.status_console = StatusConsole(
+            self.status_text,
+            max_lines=self.settings["status_max_lines"],
+            log_file=data_path('logs', 'status.log'),
+            log_max_bytes=self.settings["status_log_max_bytes"],
+            log_backups=self.settings["status_log_backups"]
+        )
+        
         # 图像预览区域
         preview_frame = ttk.LabelFrame(main_frame, text="图像预览", padding="15")
         preview_frame.grid(row=5, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
@@ -624,30 +809,31 @@ class VolcanoImageGenerator:
         self.image_path_label.config(text="未选择图像")
         # 移除预览图像
         if hasattr(self, 'image_preview_label'):
-            self.image_preview_label.config(image='')  # 清除图像
-            if hasattr(self.image_preview_label, 'image'):
-                del self.image_preview_label.image
+            self._clear_label_photo(self.image_preview_label)
         self.update_status("[信息] 已清除单张参考图像")
     
     def preview_selected_image(self, image_path):
         """预览选中的图像"""
+        # 在后台生成缩略图，完成后回到Tk线程显示
+        self.thumbnail_service.request(
+            image_path, (100, 100),
+            lambda decoded, error: self._show_selected_preview(image_path, decoded, error))
+    
+    def _show_selected_preview(self, image_path, decoded, error):
+        """显示单张参考图像的缩略图"""
+        # 已选择了其他图像或已清除，丢弃过期结果
+        if self.image_path.get() != image_path:
+            return
         try:
-            # 打开并调整图像大小用于预览
-            image = Image.open(image_path)
-            # 调整图像大小以适应预览区域
-            max_width, max_height = 100, 100
-            image.thumbnail((max_width, max_height), Image.LANCZOS)
-            
-            # 转换为Tkinter兼容的格式
-            photo = ImageTk.PhotoImage(image)
+            if error:
+                raise error
             
             # 创建或更新预览标签
             if not hasattr(self, 'image_preview_label'):
                 self.image_preview_label = ttk.Label(self.image_frame)
                 self.image_preview_label.grid(row=0, column=2, sticky=tk.W, padx=(10, 0))
             
-            self.image_preview_label.config(image=photo)
-            self.image_preview_label.image = photo  # 保持引用防止被垃圾回收
+            self._set_label_photo(self.image_preview_label, decoded)
             self.update_status(f"[信息] 已选择图像: {os.path.basename(image_path)}")
         except Exception as e:
             self.update_status(f"[错误] 无法预览图像: {str(e)}")
@@ -679,23 +865,24 @@ class VolcanoImageGenerator:
             # 移除预览图像
             preview_attr_name = f'ref_image_preview_{index}'
             if hasattr(self, preview_attr_name):
-                preview_label = getattr(self, preview_attr_name)
-                preview_label.config(image='')  # 清除图像
-                if hasattr(preview_label, 'image'):
-                    del preview_label.image
+                self._clear_label_photo(getattr(self, preview_attr_name))
             self.update_status(f"[信息] 已清除参考图像 {index+1}")
     
     def preview_reference_image(self, image_path, index):
         """预览选中的参考图像"""
+        # 在后台生成缩略图，完成后回到Tk线程显示
+        self.thumbnail_service.request(
+            image_path, (50, 50),
+            lambda decoded, error: self._show_reference_preview(image_path, index, decoded, error))
+    
+    def _show_reference_preview(self, image_path, index, decoded, error):
+        """显示参考图像的缩略图"""
+        # 该位置已选择了其他图像或已清除，丢弃过期结果
+        if index >= len(self.reference_images) or self.reference_images[index] != image_path:
+            return
         try:
-            # 打开并调整图像大小用于预览
-            image = Image.open(image_path)
-            # 调整图像大小以适应预览区域
-            max_width, max_height = 50, 50
-            image.thumbnail((max_width, max_height), Image.LANCZOS)
-            
-            # 转换为Tkinter兼容的格式
-            photo = ImageTk.PhotoImage(image)
+            if error:
+                raise error
             
             # 创建或更新预览标签
             preview_attr_name = f'ref_image_preview_{index}'
@@ -704,9 +891,7 @@ class VolcanoImageGenerator:
                 preview_label.grid(row=index+2, column=2, sticky=tk.W, padx=(10, 0))
                 setattr(self, preview_attr_name, preview_label)
             
-            preview_label = getattr(self, preview_attr_name)
-            preview_label.config(image=photo)
-            preview_label.image = photo  # 保持引用防止被垃圾回收
+            self._set_label_photo(getattr(self, preview_attr_name), decoded)
             self.update_status(f"[信息] 已选择参考图像 {index+1}: {os.path.basename(image_path)}")
         except Exception as e:
             self.update_status(f"[错误] 无法预览参考图像 {index+1}: {str(e)}")
@@ -723,100 +908,138 @@ class VolcanoImageGenerator:
             return None
     
     def update_status(self, message):
-        """更新状态信息"""
-        self.status_text.insert(tk.END, message + "\n")
-        self.status_text.see(tk.END)
-        self.root.update_idletasks()
+        """更新状态信息（可在任意线程调用，不会阻塞）"""
+        self._status_queue.put(message)
+    
+    def _drain_status_queue(self):
+        """在Tk线程中批量写入排队的状态信息"""
+        lines = []
+        try:
+            while len(lines) < STATUS_FLUSH_MAX_LINES:
+                lines.append(self._status_queue.get_nowait())
+        except queue.Empty:
+            pass
+        
+        if lines:
+            # 一次插入整批文本，只触发一次重绘
+            self.status_console.append_batch(lines)
+        
+        self.root.after(STATUS_FLUSH_INTERVAL_MS, self._drain_status_queue)
     
     def generate_image(self):
-        """在新线程中生成图像"""
-        thread = threading.Thread(target=self._generate_image_thread)
-        thread.daemon = True
-        thread.start()
+        """取好生成参数后提交到生成队列，由后台工作线程执行"""
+        self.update_status("=" * 50)
+        self.update_status("开始图像生成流程...")
+        self.update_status("=" * 50)
+        
+        spec = self.collect_generation_spec()
+        if spec is None:
+            return
+        if not self.job_queue.submit(spec, block=False):
+            self.update_status("[错误] 生成队列已满，请等待当前任务完成后再试")
+            return
+        pending = self.job_queue.pending_count()
+        if pending:
+            self.update_status(f"[信息] 任务已加入生成队列，当前排队 {pending} 个任务")
     
-    def _generate_image_thread(self):
-        """实际的图像生成过程"""
-        try:
-            self.update_status("=" * 50)
-            self.update_status("开始图像生成流程...")
-            self.update_status("=" * 50)
-            
-            # 检查是否安装了火山AI SDK
-            if not HAS_ARK_SDK:
-                self.update_status("[错误] 未安装火山AI SDK，请安装 'volcengine-python-sdk[ark]'")
-                return
-            
-            # 获取参数
-            api_key = self.api_key.get()
-            if not api_key:
-                self.update_status("[错误] 请提供API密钥 | Error: API key is required")
-                return
-                
+    def collect_generation_spec(self, prompt=None):
+        """在Tk线程中读取界面上的生成参数，返回任务字典；参数无效时返回None
+        
+        Args:
+            prompt: 可选，覆盖输入框中的提示词（批量任务使用）
+        """
+        # 检查是否安装了火山AI SDK
+        if not HAS_ARK_SDK:
+            self.update_status("[错误] 未安装火山AI SDK，请安装 'volcengine-python-sdk[ark]'")
+            return None
+        
+        # 获取参数
+        api_key = self.api_key.get()
+        if not api_key:
+            self.update_status("[错误] 请提供API密钥 | Error: API key is required")
+            return None
+        
+        if prompt is None:
             prompt = self.prompt_text.get("1.0", tk.END).strip()
-            if not prompt:
-                self.update_status("[错误] 请提供提示词 | Error: Prompt is required")
-                return
-            
+        if not prompt:
+            self.update_status("[错误] 请提供提示词 | Error: Prompt is required")
+            return None
+        
+        mode = self.mode_var.get()
+        if mode in ("img2img_single", "img2img_multi") and not self.image_path.get():
+            self.update_status("[错误] 请选择参考图像 | Error: Please select a reference image")
+            return None
+        if mode in ("multi_img2img_single", "multi_img2img_multi") and not any(self.reference_images):
+            self.update_status("[错误] 请选择至少一张参考图像 | Error: Please select at least one reference image")
+            return None
+        
+        return {
+            "api_key": api_key,
+            "prompt": prompt,
+            "model": self.model.get(),
+            "size": self.size.get(),
+            "watermark": self.watermark.get(),
+            "stream": self.stream.get(),
+            "sequential": self.sequential_gen.get() == "Auto (自动)",
+            "max_images": self.max_images.get(),
+            "mode": mode,
+            "image_path": self.image_path.get(),
+            # 过滤掉空的图像路径
+            "reference_images": [img for img in self.reference_images if img],
+        }
+    
+    def _run_generation_job(self, spec):
+        """在生成队列的工作线程中执行一个任务，只使用任务字典中的参数，不访问界面控件"""
+        # 只查询缓存的探测结果，不发起请求
+        if self.connectivity.is_key_rejected('ark', spec["api_key"]):
+            self.update_status("[错误] 火山AI API密钥在最近的连接测试中被拒绝，已跳过该任务，请检查密钥后重新测试连接")
+            return
+        try:
+            prompt = spec["prompt"]
             self.update_status(f"[参数] 提示词: {prompt[:50]}{'...' if len(prompt) > 50 else ''}")
-            self.update_status(f"[参数] 模型: {self.model.get()}")
-            self.update_status(f"[参数] 尺寸: {self.size.get()}")
-            self.update_status(f"[参数] 水印: {'开启' if self.watermark.get() else '关闭'}")
-            self.update_status(f"[参数] 流式输出: {'开启' if self.stream.get() else '关闭'}")
+            self.update_status(f"[参数] 模型: {spec['model']}")
+            self.update_status(f"[参数] 尺寸: {spec['size']}")
+            self.update_status(f"[参数] 水印: {'开启' if spec['watermark'] else '关闭'}")
+            self.update_status(f"[参数] 流式输出: {'开启' if spec['stream'] else '关闭'}")
             
             # 初始化Ark客户端
             self.update_status("[处理] 正在初始化火山AI客户端...")
             client = Ark(
                 base_url="https://ark.cn-beijing.volces.com/api/v3",
-                api_key=api_key,
+                api_key=spec["api_key"],
             )
             
             # 构建请求参数
             request_params = {
-                "model": self.model.get(),
+                "model": spec["model"],
                 "prompt": prompt,
-                "size": self.size.get(),
-                "watermark": self.watermark.get(),
+                "size": spec["size"],
+                "watermark": spec["watermark"],
                 "response_format": "url"
             }
             
             # 流式输出参数
-            if self.stream.get():
+            if spec["stream"]:
                 request_params["stream"] = True
             
             # 连续生成参数
-            sequential_value = self.sequential_gen.get()
-            if sequential_value == "Auto (自动)":
+            if spec["sequential"]:
                 request_params["sequential_image_generation"] = "auto"
                 request_params["sequential_image_generation_options"] = SequentialImageGenerationOptions(
-                    max_images=self.max_images.get()
+                    max_images=spec["max_images"]
                 )
-                self.update_status(f"[参数] Sequential Generation: Enabled (开启), Max Images: {self.max_images.get()}")
+                self.update_status(f"[参数] Sequential Generation: Enabled (开启), Max Images: {spec['max_images']}")
             else:
                 request_params["sequential_image_generation"] = "disabled"
                 self.update_status("[参数] Sequential Generation: Disabled (禁用)")
             
             # 根据模式添加图像参数
-            mode = self.mode_var.get()
+            mode = spec["mode"]
             self.update_status(f"[模式] 当前生成模式: {mode}")
             
-            if mode == "img2img_single":
-                if not self.image_path.get():
-                    self.update_status("[错误] 请选择参考图像 | Error: Please select a reference image")
-                    return
+            if mode == "img2img_single" or mode == "img2img_multi":
                 self.update_status("[处理] 正在编码参考图像...")
-                encoded_image = self.encode_image_to_base64(self.image_path.get())
-                if encoded_image:
-                    request_params["image"] = encoded_image
-                    self.update_status("[处理] 参考图像编码完成")
-                else:
-                    self.update_status("[错误] 参考图像编码失败 | Error: Failed to encode reference image")
-                    return
-            elif mode == "img2img_multi":
-                if not self.image_path.get():
-                    self.update_status("[错误] 请选择参考图像 | Error: Please select a reference image")
-                    return
-                self.update_status("[处理] 正在编码参考图像...")
-                encoded_image = self.encode_image_to_base64(self.image_path.get())
+                encoded_image = self.encode_image_to_base64(spec["image_path"])
                 if encoded_image:
                     request_params["image"] = encoded_image
                     self.update_status("[处理] 参考图像编码完成")
@@ -824,11 +1047,7 @@ class VolcanoImageGenerator:
                     self.update_status("[错误] 参考图像编码失败 | Error: Failed to encode reference image")
                     return
             elif mode == "multi_img2img_single" or mode == "multi_img2img_multi":
-                if not self.reference_images or not any(self.reference_images):
-                    self.update_status("[错误] 请选择至少一张参考图像 | Error: Please select at least one reference image")
-                    return
-                # 过滤掉空的图像路径
-                valid_images = [img for img in self.reference_images if img]
+                valid_images = spec["reference_images"]
                 self.update_status(f"[处理] 正在编码 {len(valid_images)} 张参考图像...")
                 encoded_images = []
                 for i, img_path in enumerate(valid_images):
@@ -851,7 +1070,7 @@ class VolcanoImageGenerator:
                     # 多图参考生成组图模式
                     request_params["sequential_image_generation"] = "auto"
                     request_params["sequential_image_generation_options"] = SequentialImageGenerationOptions(
-                        max_images=self.max_images.get()
+                        max_images=spec["max_images"]
                     )
                     # 传递所有参考图像
                     request_params["image"] = encoded_images
@@ -859,17 +1078,31 @@ class VolcanoImageGenerator:
                 
                 self.update_status(f"[处理] 所有 {len(encoded_images)} 张图像编码完成")
             
+            # 任务信息，随下载的图像一起记录到输出存储
+            job = {
+                "job_id": self.output_store.new_job_id(),
+                "prompt": prompt,
+                "model": request_params["model"],
+                "size": request_params["size"],
+                "mode": mode
+            }
+            # 批量任务附带的来源信息（原提示词等）一并记录
+            job.update(spec.get("extra", {}))
+            on_usage = self.usage_tracker.recorder(
+                'ark', spec["api_key"], job["model"], job_id=job["job_id"], batch=job.get("batch_id"),
+                kind='generate')
+            
             # 发送请求
             self.update_status("[网络] 正在发送请求到火山AI服务...")
-            if self.stream.get():
+            if spec["stream"]:
                 # 流式输出模式
                 self.update_status("[流式] 启用流式输出模式...")
                 stream = client.images.generate(**request_params)
-                self.handle_stream_response(stream)
+                self.handle_stream_response(stream, job, on_usage)
             else:
                 # 普通模式
                 imagesResponse = client.images.generate(**request_params)
-                self.handle_regular_response(imagesResponse)
+                self.handle_regular_response(imagesResponse, job, on_usage)
                     
         except Exception as e:
             self.update_status(f"[异常] 发生未预期的错误: {str(e)} | [Exception] Unexpected error occurred: {str(e)}")
@@ -877,7 +1110,7 @@ class VolcanoImageGenerator:
             self.update_status("[异常详情] 详细错误信息:")
             self.update_status(traceback.format_exc())
     
-    def handle_regular_response(self, imagesResponse):
+    def handle_regular_response(self, imagesResponse, job, on_usage=None):
         """处理普通响应"""
         try:
             self.update_status("[成功] 请求成功发送到火山AI服务!")
@@ -886,14 +1119,17 @@ class VolcanoImageGenerator:
             if hasattr(imagesResponse, 'data') and imagesResponse.data:
                 images = imagesResponse.data
                 self.update_status(f"[结果] 成功生成 {len(images)} 张图像")
+                if on_usage is not None:
+                    on_usage(getattr(imagesResponse, 'usage', None), images=len(images))
                 
-                # 下载并显示第一张图像
+                # 按URL过期时间调度下载所有图像，第一张下载完成后显示
                 if images:
                     first_image = images[0]
                     if hasattr(first_image, 'url') and first_image.url:
-                        first_image_url = first_image.url
-                        self.update_status("[下载] 正在下载第一张生成的图像...")
-                        self.download_and_display_image(first_image_url)
+                        self.update_status(f"[下载] 已将 {len(images)} 张图像加入下载队列...")
+                        for i, img in enumerate(images):
+                            if hasattr(img, 'url') and img.url:
+                                self.schedule_image_download(job, i, img.url, display=(i == 0))
                         
                         # 显示所有图像URL
                         self.update_status("[结果] 生成的图像URL列表:")
@@ -915,7 +1151,7 @@ class VolcanoImageGenerator:
             self.update_status("[异常详情] 详细错误信息:")
             self.update_status(traceback.format_exc())
     
-    def handle_stream_response(self, stream):
+    def handle_stream_response(self, stream, job, on_usage=None):
         """处理流式响应"""
         try:
             self.update_status("[流式] 开始处理流式响应...")
@@ -934,18 +1170,23 @@ class VolcanoImageGenerator:
                     if event.error is None and event.url:
                         self.update_status(f"[流式] 接收到图像: Size: {event.size}, URL: {event.url}")
                         image_urls.append(event.url)
-                        # 下载并显示第一张图像
+                        # 收到URL立即加入下载队列，第一张下载完成后显示
                         if len(image_urls) == 1:
                             self.update_status("[下载] 正在下载第一张生成的图像...")
-                            self.download_and_display_image(event.url)
+                        self.schedule_image_download(job, len(image_urls) - 1, event.url,
+                                                     display=(len(image_urls) == 1))
                             
                 elif event.type == "image_generation.completed":
                     if event.error is None:
                         self.update_status("[流式] 图像生成完成")
-                        self.update_status(f"[流式] 最终使用情况: {event.usage}")
+                        if on_usage is not None:
+                            on_usage(getattr(event, 'usage', None), images=len(image_urls))
                         
                 elif event.type == "image_generation.partial_image":
                     self.update_status(f"[流式] 部分图像数据: index={event.partial_image_index}, size={len(event.b64_json) if event.b64_json else 0}")
+                    # 第一张最终图像到达前，逐步显示部分图像
+                    if event.b64_json and not image_urls:
+                        self.queue_partial_preview(event.b64_json)
             
             # 显示所有图像URL
             if image_urls:
@@ -963,43 +1204,192 @@ class VolcanoImageGenerator:
             self.update_status("[异常详情] 详细错误信息:")
             self.update_status(traceback.format_exc())
     
-    def download_and_display_image(self, image_url):
-        """下载并显示图像"""
+    def schedule_image_download(self, job, index, image_url, display=False):
+        """将图像URL加入下载调度器，下载完成后记录到输出存储"""
+        dest_path = self.output_store.output_path(job["job_id"], index)
+        
+        metadata = image_metadata(dict(job, index=index))
+        
+        def on_ingested(task, variants, error):
+            if error:
+                self.update_status(f"[后处理] 图像 {index+1} 处理失败: {str(error)}")
+            record = self.output_store.add_record(
+                dict(metadata, url=task.url, path=task.dest_path, variants=variants or []))
+            self.update_status(f"[下载] 图像 {index+1} 已保存: {task.dest_path}")
+            self.root.after(0, lambda: self.add_to_gallery(record))
+            if display:
+                self.root.after(0, lambda: self.show_downloaded_image(task.dest_path, record))
+        
+        def on_complete(task):
+            # 在后处理进程中写入元数据并生成缩小版本
+            self.post_processor.submit_ingest(
+                task.dest_path, metadata, self.settings["postprocess_variants"],
+                callback=lambda variants, error: on_ingested(task, variants, error))
+        
+        self.download_scheduler.submit(image_url, dest_path, on_complete=on_complete)
+    
+    def queue_partial_preview(self, b64_data):
+        """在工作线程中解码部分图像，并安排在Tk线程中显示"""
         try:
-            self.update_status("正在下载图像...")
-            response = requests.get(image_url)
-            
-            if response.status_code == 200:
-                # 保存临时文件
-                temp_filename = "temp_image.jpg"
-                with open(temp_filename, "wb") as f:
-                    f.write(response.content)
-                
-                # 显示图像
-                self.display_image(temp_filename)
-                self.current_image_path = temp_filename
-                self.update_status("图像显示完成")
-            else:
-                self.update_status(f"下载图像失败: {response.status_code}")
-                
+            image = Image.open(io.BytesIO(base64.b64decode(b64_data)))
+            image.thumbnail(PREVIEW_MAX_SIZE, Image.BILINEAR)
+            decoded = DecodedImage.from_image(image)
         except Exception as e:
-            self.update_status(f"下载或显示图像时出错: {str(e)}")
+            self.update_status(f"[流式] 部分图像解码失败: {str(e)}")
+            return
+        
+        with self._partial_preview_lock:
+            # 只保留最新一帧，重绘间隔内到达的旧帧直接丢弃
+            self._pending_partial_preview = decoded
+            if self._partial_preview_scheduled:
+                return
+            self._partial_preview_scheduled = True
+        self.root.after(PARTIAL_PREVIEW_INTERVAL_MS, self._flush_partial_preview)
+    
+    def _flush_partial_preview(self):
+        """在Tk线程中显示最新的部分图像"""
+        with self._partial_preview_lock:
+            decoded = self._pending_partial_preview
+            self._pending_partial_preview = None
+            self._partial_preview_scheduled = False
+        if decoded is None:
+            return
+        self._set_label_photo(self.image_label, decoded)
+    
+    def show_downloaded_image(self, image_path, record=None):
+        """显示下载完成的图像"""
+        # 丢弃尚未显示的部分图像，避免覆盖最终图像
+        with self._partial_preview_lock:
+            self._pending_partial_preview = None
+        self.display_image(image_path)
+        self.current_image_path = image_path
+        self.current_image_record = record
+        self.update_status("图像显示完成")
+    
+    def open_gallery(self):
+        """打开图库窗口，浏览所有已下载的图像"""
+        if self.gallery_view and self.gallery_view.is_open():
+            self.gallery_view.window.lift()
+            return
+        records = [record for record in self.output_store.iter_records()
+                   if record.get('path') and os.path.exists(record['path'])]
+        self.gallery_view = GalleryView(
+            self.root, records, self.thumbnail_service, self.image_cache,
+            on_select=self.on_gallery_select,
+            on_open=self.on_gallery_open
+        )
+        self.update_status(f"[信息] 图库已打开，共 {len(records)} 张图像")
+    
+    def add_to_gallery(self, record):
+        """新图像下载完成后追加到已打开的图库"""
+        if self.gallery_view and self.gallery_view.is_open():
+            self.gallery_view.add_record(record)
+    
+    def on_gallery_select(self, record):
+        """在图库中单击图像：显示到主窗口预览区"""
+        self.show_downloaded_image(record['path'], record)
+    
+    def on_gallery_open(self, record):
+        """在图库中双击图像：放大查看"""
+        self.show_downloaded_image(record['path'], record)
+        self.zoom_image()
+    
+    def open_compare_view(self):
+        """并排对比最近一次组图任务的所有输出"""
+        records = [record for record in self.output_store.latest_group()
+                   if record.get('path') and os.path.exists(record['path'])]
+        if len(records) < 2:
+            self.update_status("[信息] 没有可对比的组图输出")
+            return
+        CompareView(self.root, records, self.decode_service, self.pyramid_cache, self.image_cache,
+                    log=self.update_status)
+        self.update_status(f"[信息] 对比窗口已打开，共 {len(records)} 张图像，滚轮缩放、拖动平移在所有窗格间联动")
+    
+    def show_usage_summary(self):
+        """在后台读取用量记录，按密钥、小时和批次汇总后在窗口中显示"""
+        def run():
+            try:
+                summaries = {by: self.usage_tracker.summarize(by) for by in ('key', 'hour', 'batch')}
+            except Exception as e:
+                self.update_status(f"[错误] 读取用量记录失败: {str(e)}")
+                return
+            self.root.after(0, lambda: self._open_usage_window(summaries))
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def _open_usage_window(self, summaries):
+        """用量汇总窗口：每种汇总方式一个标签页"""
+        window = tk.Toplevel(self.root)
+        window.title("用量统计")
+        window.geometry("820x420")
+        notebook = ttk.Notebook(window)
+        notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        headings = {'requests': "请求数", 'images': "图像数", 'prompt_tokens': "输入tokens",
+                    'completion_tokens': "输出tokens(DeepSeek)", 'output_tokens': "输出tokens(图像)",
+                    'total_tokens': "合计tokens"}
+        titles = {'key': "按密钥", 'hour': "按小时", 'batch': "按批次"}
+        for by, summary in summaries.items():
+            frame = ttk.Frame(notebook)
+            notebook.add(frame, text=titles[by])
+            tree = ttk.Treeview(frame, columns=TOTAL_FIELDS, show='tree headings')
+            tree.heading('#0', text=titles[by][1:])
+            tree.column('#0', width=160)
+            for name in TOTAL_FIELDS:
+                tree.heading(name, text=headings[name])
+                tree.column(name, width=100, anchor=tk.E)
+            scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=tree.yview)
+            tree.configure(yscrollcommand=scrollbar.set)
+            tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+            for group, totals in summary.items():
+                tree.insert('', tk.END, text=group, values=[totals[name] for name in TOTAL_FIELDS])
+        if not any(summaries.values()):
+            self.update_status("[信息] 还没有用量记录")
+    
+    def on_download_expired(self, task):
+        """图像URL在下载前已过期：逐条写入状态日志，短时间内的多条合并为一个提示框"""
+        self.update_status(f"[下载] 图像URL已过期，未能下载: {task.url}")
+        with self._expired_lock:
+            self._expired_urls.append(task.url)
+            if self._expired_alert_scheduled:
+                return
+            self._expired_alert_scheduled = True
+        self.root.after(EXPIRED_ALERT_DELAY_MS, self._show_expired_alert)
+    
+    def _show_expired_alert(self):
+        """在Tk线程中汇总显示已过期的URL"""
+        with self._expired_lock:
+            urls = self._expired_urls
+            self._expired_urls = []
+            self._expired_alert_scheduled = False
+        if not urls:
+            return
+        message = f"{len(urls)} 张图像的URL已过期，未能下载:\n" + "\n".join(urls[:5])
+        if len(urls) > 5:
+            message += f"\n……另有 {len(urls) - 5} 条，完整列表见状态日志"
+        messagebox.showwarning("下载告警", message)
     
     def display_image(self, image_path):
         """在GUI中显示图像"""
+        self._display_request = image_path
+        self.thumbnail_service.request(
+            image_path, PREVIEW_MAX_SIZE,
+            lambda decoded, error: self._show_display_image(image_path, decoded, error))
+    
+    def _show_display_image(self, image_path, decoded, error):
+        """显示生成结果的缩略图"""
+        # 之后又请求了其他图像，丢弃过期结果
+        if self._display_request != image_path:
+            return
         try:
-            # 打开并调整图像大小
-            image = Image.open(image_path)
-            # 调整图像大小以适应显示区域
-            max_width, max_height = 400, 300
-            image.thumbnail((max_width, max_height), Image.LANCZOS)
-            
-            # 转换为Tkinter兼容的格式
-            photo = ImageTk.PhotoImage(image)
+            if error:
+                raise error
             
             # 更新标签
-            self.image_label.config(image=photo)
-            self.image_label.image = photo  # 保持引用防止被垃圾回收
+            self._set_label_photo(self.image_label, decoded)
         except Exception as e:
             self.update_status(f"显示图像时出错: {str(e)}")
     
@@ -1010,18 +1400,28 @@ class VolcanoImageGenerator:
             return
             
         try:
-            # 询问保存位置
+            # 询问保存位置，按所选扩展名转换格式
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".jpg",
-                filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png"), ("All files", "*.*")]
+                filetypes=supported_save_filetypes()
             )
             
             if file_path:
-                # 复制临时文件到新位置
-                with open(self.current_image_path, "rb") as src:
-                    with open(file_path, "wb") as dst:
-                        dst.write(src.read())
-                self.update_status(f"图像已保存到: {file_path}")
+                self.update_status(f"正在保存图像: {file_path}")
+                
+                def on_saved(written, error):
+                    if error:
+                        self.update_status(f"保存图像时出错: {str(error)}")
+                    else:
+                        self.update_status(f"图像已保存到: {file_path}")
+                
+                # 在后处理进程中编码，避免4K图像编码阻塞界面
+                self.post_processor.submit_convert(
+                    self.current_image_path, file_path,
+                    quality=self.save_quality.get(),
+                    metadata=image_metadata(self.current_image_record),
+                    callback=on_saved
+                )
         except Exception as e:
             self.update_status(f"保存图像时出错: {str(e)}")
     
@@ -1030,7 +1430,20 @@ class VolcanoImageGenerator:
         if not self.current_image_path or not os.path.exists(self.current_image_path):
             self.update_status("没有可放大的图像")
             return
-            
+        
+        # 在后台解码并构建金字塔，完成后再打开窗口
+        image_path = self.current_image_path
+        self.update_status("[信息] 正在加载放大图像...")
+        self.decode_service.run(
+            self.pyramid_cache.get, image_path,
+            callback=lambda pyramid, error: self._open_zoom_window(pyramid, error))
+    
+    def _open_zoom_window(self, pyramid, error):
+        """创建放大预览窗口"""
+        if error:
+            self.update_status(f"放大图像时出错: {str(error)}")
+            return
+        
         try:
             # 创建新的弹窗显示放大图像
             zoom_window = tk.Toplevel(self.root)
@@ -1045,61 +1458,31 @@ class VolcanoImageGenerator:
             canvas = tk.Canvas(canvas_frame, bg="white")
             canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
             
+            # 只渲染可见区域的图块，内存占用与缩放比例无关
+            viewer = ZoomViewer(canvas, pyramid)
+            
             # 添加滚动条
-            v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=canvas.yview)
+            v_scrollbar = ttk.Scrollbar(canvas_frame, orient=tk.VERTICAL, command=viewer.yview)
             v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            h_scrollbar = ttk.Scrollbar(zoom_window, orient=tk.HORIZONTAL, command=canvas.xview)
+            h_scrollbar = ttk.Scrollbar(zoom_window, orient=tk.HORIZONTAL, command=viewer.xview)
             h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X)
             
             canvas.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
             
-            # 打开放大图像
-            image = Image.open(self.current_image_path)
-            
-            # 转换为Tkinter兼容的格式
-            photo = ImageTk.PhotoImage(image)
-            
-            # 在画布上显示图像
-            canvas_image = canvas.create_image(0, 0, anchor=tk.NW, image=photo)
-            
-            # 设置滚动区域
-            canvas.config(scrollregion=canvas.bbox(tk.ALL))
-            
-            # 保持引用防止被垃圾回收
-            zoom_window.photo = photo
+            # 保持引用防止被垃圾回收；窗口打开期间金字塔在图像缓存中保持固定
+            zoom_window.viewer = viewer
+            self.image_cache.pin(pyramid.key)
+            zoom_window.bind(
+                "<Destroy>",
+                lambda event: self.image_cache.unpin(pyramid.key) if event.widget is zoom_window else None)
             
             # 添加缩放功能
             def zoom_wheel(event):
-                # 获取当前缩放比例
-                scale = 1.0
-                if hasattr(zoom_window, 'scale'):
-                    scale = zoom_window.scale
-                    
-                # 根据滚轮方向调整缩放比例
-                if event.delta > 0:
-                    scale *= 1.1  # 放大
-                else:
-                    scale *= 0.9  # 缩小
-                    
-                # 限制缩放范围
-                scale = max(0.1, min(scale, 5.0))
-                zoom_window.scale = scale
-                
-                # 重新加载图像并应用缩放
-                image = Image.open(self.current_image_path)
-                new_width = int(image.width * scale)
-                new_height = int(image.height * scale)
-                resized_image = image.resize((new_width, new_height), Image.LANCZOS)
-                
-                # 转换为Tkinter兼容的格式
-                photo = ImageTk.PhotoImage(resized_image)
-                
-                # 更新画布上的图像
-                canvas.itemconfig(canvas_image, image=photo)
-                canvas.config(scrollregion=canvas.bbox(tk.ALL))
+                # 根据滚轮方向调整缩放比例（Linux下通过Button-4/5区分方向）
+                factor = 1.1 if event.num == 4 or event.delta > 0 else 0.9
                 
-                # 保持引用防止被垃圾回收
-                zoom_window.photo = photo
+                # 以鼠标位置为中心缩放，同一帧内的滚轮事件合并渲染
+                viewer.zoom_by(factor, event.x, event.y)
             
             # 绑定鼠标滚轮事件
             canvas.bind("<MouseWheel>", zoom_wheel)
@@ -1107,175 +1490,158 @@ class VolcanoImageGenerator:
             canvas.bind("<Button-5>", zoom_wheel)  # Linux支持
             
             # 添加说明文本
-            self.update_status("双击放大图像窗口已打开，使用鼠标滚轮可以缩放图像")
+            self.update_status("双击放大图像窗口已打开，使用鼠标滚轮可以缩放图像，按住左键拖动可以平移")
             
         except Exception as e:
             self.update_status(f"放大图像时出错: {str(e)}")
     
-    def test_api_connectivity(self):
-        """测试API连通性"""
-        self.update_status("=" * 50)
-        self.update_status("开始API连接测试...")
-        self.update_status("=" * 50)
-        
-        # 检查是否安装了火山AI SDK
-        if not HAS_ARK_SDK:
-            self.update_status("[错误] 未安装火山AI SDK，请安装 'volcengine-python-sdk[ark]'")
-            messagebox.showerror("错误", "未安装火山AI SDK，请安装 'volcengine-python-sdk[ark]'")
-            return
-        
-        api_key = self.api_key.get()
-        if not api_key:
-            self.update_status("[错误] 请先输入API密钥 | Error: Please enter API key first")
-            messagebox.showerror("错误", "请先输入API密钥")
-            return
-            
-        self.update_status("[处理] 正在测试API连通性...")
-        
-        try:
-            # 初始化Ark客户端
-            self.update_status("[处理] 正在初始化火山AI客户端...")
-            client = Ark(
-                base_url="https://ark.cn-beijing.volces.com/api/v3",
-                api_key=api_key,
-            )
-            
-            self.update_status("[网络] 正在连接到火山AI服务...")
-            # 使用一个简单的图像生成请求来测试API密钥
-            # 我们发送一个带有简单参数的请求，如果API密钥有效，会返回具体的错误而不是认证错误
-            try:
-                # 创建一个简单的测试请求，使用支持的参数
-                test_params = {
-                    "model": "test-model",  # 使用一个不存在但格式正确的模型名
-                    "prompt": "test",
-                    "size": "512x512"
-                }
-                
-                # 尝试发送请求
-                response = client.images.generate(**test_params)
-                # 如果能到达这里，说明API密钥有效
-                self.update_status("[成功] API连接测试成功!")
-                self.update_status("[信息] API密钥有效，可以正常连接到火山AI服务")
-                messagebox.showinfo("成功", "API密钥有效，可以正常连接到火山AI服务")
-            except Exception as e:
-                # 检查异常类型来判断API密钥是否有效
-                error_str = str(e).lower()
-                if "401" in error_str or "unauthorized" in error_str or "invalid api key" in error_str:
-                    self.update_status("[错误] API连接测试失败: API密钥无效")
-                    self.update_status("[解决方案] 请检查您的API密钥是否正确")
-                    messagebox.showerror("错误", "API密钥无效，请检查您的API密钥")
-                elif "403" in error_str or "forbidden" in error_str:
-                    self.update_status("[错误] API连接测试失败: 访问被拒绝")
-                    self.update_status("[解决方案] 请检查您的API密钥和权限设置")
-                    messagebox.showerror("错误", "访问被拒绝，请检查您的API密钥和权限")
-                elif "400" in error_str or "bad request" in error_str or "404" in error_str:
-                    # 400/404错误表示API端点是可访问的，API密钥有效
-                    self.update_status("[成功] API连接测试成功!")
-                    self.update_status("[信息] API密钥有效，可以正常连接到火山AI服务")
-                    messagebox.showinfo("成功", "API密钥有效，可以正常连接到火山AI服务")
-                else:
-                    self.update_status(f"[错误] API连接测试失败: {str(e)}")
-                    self.update_status("[解决方案] 请检查网络连接和API密钥")
-                    messagebox.showerror("错误", f"连接失败: {str(e)}")
-                
-        except Exception as e:
-            self.update_status(f"[异常] API连接测试失败: {str(e)}")
-            self.update_status("[解决方案] 请检查网络连接和API密钥")
-            messagebox.showerror("错误", f"测试过程中发生错误: {str(e)}")
-        
-        self.update_status("=" * 50)
-        self.update_status("API连接测试完成!")
-        self.update_status("=" * 50)
-
-    def test_deepseek_connectivity(self):
-        """测试DeepSeek API连通性"""
-        self.update_status("=" * 50)
-        self.update_status("开始DeepSeek API连接测试...")
-        self.update_status("=" * 50)
-        
-        # 导入openai库
+    def get_deepseek_client(self, api_key):
+        """获取进程内共享的DeepSeek客户端（按密钥缓存，带keep-alive连接池，可跨线程使用）"""
+        from volcano_ai_proxy import get_shared_deepseek_client
+        return get_shared_deepseek_client(
+            api_key,
+            timeout=self.settings["deepseek_timeout"],
+            pool_limits={
+                "max_connections": self.settings["deepseek_max_connections"],
+                "max_keepalive_connections": self.settings["deepseek_max_keepalive"],
+            })
+    
+    def make_async_deepseek_client_factory(self, api_key):
+        """返回创建异步DeepSeek客户端的函数，在批量优化的事件循环中调用"""
+        timeout = self.settings["deepseek_timeout"]
+        # 异步模式下同时进行的请求更多，连接池至少容纳全部并发
+        max_connections = max(self.settings["deepseek_max_connections"],
+                              self.settings["batch_optimize_async_concurrency"])
+        
+        def factory():
+            from volcano_ai_proxy import create_async_deepseek_client
+            return create_async_deepseek_client(
+                api_key,
+                timeout=timeout,
+                pool_limits={
+                    "max_connections": max_connections,
+                    "max_keepalive_connections": max_connections,
+                })
+        return factory
+    
+    def _set_label_photo(self, label, decoded):
+        """在标签上显示图像，显示期间其PhotoImage在图像缓存中保持固定"""
+        photo, key = cached_photo_image(self.image_cache, decoded)
+        # 先固定新图像再释放旧图像，两者相同时不会被淘汰
+        if key is not None:
+            self.image_cache.pin(key)
+        self._clear_label_photo(label)
+        label.config(image=photo)
+        label.image = photo  # 保持引用防止被垃圾回收
+        label.image_key = key
+    
+    def _clear_label_photo(self, label):
+        """清除标签上的图像并取消其固定"""
+        label.config(image='')
+        key = getattr(label, 'image_key', None)
+        if key is not None:
+            self.image_cache.unpin(key)
+        label.image = None
+        label.image_key = None
+    
+    def shutdown(self):
+        """退出时停止后台下载和后处理"""
+        self.job_queue.shutdown()
+        self.download_scheduler.shutdown()
+        self.post_processor.shutdown()
+        self.decode_service.shutdown()
         try:
-            from openai import OpenAI
+            from volcano_ai_proxy import close_shared_clients
+            close_shared_clients()
         except ImportError:
-            self.update_status("[错误] 未安装openai库，请运行 'pip install openai'")
-            messagebox.showerror("错误", "未安装openai库，请运行 'pip install openai'")
+            pass
+        self.status_console.close()
+    
+    def test_api_connectivity(self):
+        """测试火山AI API连通性（后台探测，不阻塞界面）"""
+        self.run_connectivity_tests(['ark'])
+    
+    def test_deepseek_connectivity(self):
+        """测试DeepSeek API连通性（后台探测，不阻塞界面）"""
+        self.run_connectivity_tests(['deepseek'])
+    
+    def test_all_connectivity(self):
+        """同时测试火山AI和DeepSeek的连通性"""
+        self.run_connectivity_tests(['ark', 'deepseek'])
+    
+    def run_connectivity_tests(self, services):
+        """在Tk线程中取好密钥，在后台线程中同时探测各服务，结果回到Tk线程显示
+        
+        测试按钮总是重新探测；探测结果会缓存，生成任务执行前据此跳过已知无效的密钥。
+        """
+        checks = {}
+        for service in services:
+            if service == 'ark':
+                api_key = self.api_key.get()
+                if not api_key:
+                    self.update_status("[错误] 请先输入API密钥 | Error: Please enter API key first")
+                    messagebox.showerror("错误", "请先输入API密钥")
+                    continue
+                checks['ark'] = (api_key, lambda api_key=api_key: probe_ark(api_key))
+            elif service == 'deepseek':
+                api_key = self.deepseek_api_key.get()
+                if not api_key:
+                    self.update_status("[错误] 请先输入DeepSeek API密钥 | Error: Please enter DeepSeek API key first")
+                    messagebox.showerror("错误", "请先输入DeepSeek API密钥")
+                    continue
+                try:
+                    client = self.get_deepseek_client(api_key)
+                except Exception as e:
+                    self.update_status(f"[错误] 无法创建DeepSeek客户端: {str(e)}")
+                    messagebox.showerror("错误", f"无法创建DeepSeek客户端: {str(e)}")
+                    continue
+                checks['deepseek'] = (api_key, lambda client=client: probe_deepseek(client))
+        if not checks:
             return
         
-        api_key = self.deepseek_api_key.get()
-        if not api_key:
-            self.update_status("[错误] 请先输入DeepSeek API密钥 | Error: Please enter DeepSeek API key first")
-            messagebox.showerror("错误", "请先输入DeepSeek API密钥")
-            return
-            
-        self.update_status("[处理] 正在测试DeepSeek API连通性...")
+        names = "、".join(SERVICE_NAMES[service] for service in checks)
+        self.update_status(f"[网络] 正在测试 {names} 的连通性...")
         
-        try:
-            # 初始化OpenAI客户端 - 修复：移除proxies参数
-            self.update_status("[处理] 正在初始化DeepSeek客户端...")
-            
-            # 创建配置字典，只包含必要的参数
-            client_config = {
-                "api_key": api_key,
-                "base_url": "https://api.deepseek.com",
-            }
-            
-            # 在封装环境中，避免传递proxies参数
-            client = OpenAI(**client_config)
-            
-            self.update_status("[网络] 正在连接到DeepSeek服务...")
-            # 使用一个简单的聊天完成请求来测试API密钥
+        def run():
             try:
-                response = client.chat.completions.create(
-                    model="deepseek-chat",
-                    messages=[
-                        {"role": "user", "content": "Hello, this is a test message."}
-                    ],
-                    max_tokens=10,
-                    temperature=0.1
-                )
-                
-                # 如果能到达这里，说明API密钥有效
-                self.update_status("[成功] DeepSeek API连接测试成功!")
-                self.update_status("[信息] API密钥有效，可以正常连接到DeepSeek服务")
-                messagebox.showinfo("成功", "DeepSeek API密钥有效，可以正常连接到DeepSeek服务")
-                
+                results = self.connectivity.check_many(checks, force=True)
             except Exception as e:
-                # 检查异常类型来判断API密钥是否有效
-                error_str = str(e).lower()
-                if "401" in error_str or "unauthorized" in error_str or "invalid api key" in error_str:
-                    self.update_status("[错误] DeepSeek API连接测试失败: API密钥无效")
-                    self.update_status("[解决方案] 请检查您的DeepSeek API密钥是否正确")
-                    messagebox.showerror("错误", "DeepSeek API密钥无效，请检查您的API密钥")
-                elif "403" in error_str or "forbidden" in error_str:
-                    self.update_status("[错误] DeepSeek API连接测试失败: 访问被拒绝")
-                    self.update_status("[解决方案] 请检查您的DeepSeek API密钥和权限设置")
-                    messagebox.showerror("错误", "访问被拒绝，请检查您的API密钥和权限")
-                else:
-                    self.update_status(f"[错误] DeepSeek API连接测试失败: {str(e)}")
-                    self.update_status("[解决方案] 请检查网络连接和API密钥")
-                    messagebox.showerror("错误", f"连接失败: {str(e)}")
-                
-        except Exception as e:
-            self.update_status(f"[异常] DeepSeek API连接测试失败: {str(e)}")
-            self.update_status("[解决方案] 请检查网络连接和API密钥")
-            messagebox.showerror("错误", f"测试过程中发生错误: {str(e)}")
+                self.update_status(f"[异常] 连接测试失败: {str(e)}")
+                return
+            self.root.after(0, self._show_connectivity_results, results)
         
-        self.update_status("=" * 50)
-        self.update_status("DeepSeek API连接测试完成!")
-        self.update_status("=" * 50)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def _show_connectivity_results(self, results):
+        """在Tk线程中汇报探测结果"""
+        lines = []
+        for service, result in results.items():
+            name = SERVICE_NAMES[service]
+            if result['ok']:
+                self.update_status(f"[成功] {name} 连接测试成功: {result['message']}（{result['latency'] * 1000:.0f} ms）")
+            else:
+                self.update_status(f"[错误] {name} 连接测试失败: {result['message']}")
+                self.update_status("[解决方案] 请检查网络连接和API密钥")
+            lines.append(f"{name}: {result['message']}")
+        if all(result['ok'] for result in results.values()):
+            messagebox.showinfo("成功", "\n".join(lines))
+        else:
+            messagebox.showerror("错误", "\n".join(lines))
     
     def optimize_prompt_with_ai(self):
-        """使用DeepSeek AI优化提示词"""
+        """使用DeepSeek AI优化提示词，请求在后台线程中流式进行，结果逐段写入输入框"""
+        if self._optimize_cancel is not None:
+            self.update_status("[信息] 提示词优化正在进行中，可点击“取消优化”中止")
+            return
+        
         self.update_status("=" * 50)
         self.update_status("开始使用AI优化提示词...")
         self.update_status("=" * 50)
         
-        # 导入openai库
-        try:
-            from openai import OpenAI
-        except ImportError:
-            self.update_status("[错误] 未安装openai库，请运行 'pip install openai'")
-            messagebox.showerror("错误", "未安装openai库，请运行 'pip install openai'")
+        # 检查是否安装了openai库
+        if not self._check_openai_installed():
             return
         
         # 检查DeepSeek API密钥
@@ -1295,55 +1661,125 @@ class VolcanoImageGenerator:
         # 获取人格预设
         persona_preset = self.persona_preset.get("1.0", tk.END).strip()
         
+        # 获取选择的模型
+        selected_model = self.deepseek_model.get()
+        
+        # 多个变体：一次请求取得所有变体并分别生成图像
+        try:
+            variant_count = self.variant_count.get()
+        except tk.TclError:
+            variant_count = 1
+        if variant_count > 1:
+            self._start_variant_fanout(api_key, current_prompt, persona_preset, selected_model, variant_count)
+            return
+        
+        # 相同的提示词、人格预设和模型已优化过时直接使用缓存结果
+        if not self.force_new_optimization.get():
+            cached_prompt = self.prompt_cache.get(current_prompt, persona_preset, selected_model)
+            if cached_prompt is not None:
+                self.prompt_text.delete("1.0", tk.END)
+                self.prompt_text.insert("1.0", cached_prompt)
+                self.update_status("[成功] 提示词优化完成（使用缓存结果，未调用API）")
+                self.update_status("[信息] 如需重新生成，请勾选“强制重新优化”")
+                self.update_status("=" * 50)
+                return
+        
         self.update_status("[处理] 正在使用DeepSeek AI优化提示词...")
         
+        # 在Tk线程中取好所有输入，工作线程不访问任何控件
+        cancel_event = threading.Event()
+        self._optimize_cancel = cancel_event
+        self._optimize_original_prompt = current_prompt
+        self._optimize_stream_started = False
+        self.cancel_optimize_button.config(state=tk.NORMAL)
+        
+        thread = threading.Thread(
+            target=self._optimize_prompt_thread,
+            args=(cancel_event, api_key, current_prompt, persona_preset, selected_model))
+        thread.daemon = True
+        thread.start()
+    
+    def _optimize_prompt_thread(self, cancel_event, api_key, current_prompt, persona_preset, selected_model):
+        """后台线程：流式请求DeepSeek，文本片段通过节流队列交给Tk线程"""
         try:
-            # 初始化OpenAI客户端 - 修复：移除proxies参数
-            client_config = {
-                "api_key": api_key,
-                "base_url": "https://api.deepseek.com",
-            }
-            
-            client = OpenAI(**client_config)
-            
-            # 构造提示词优化的系统消息
-            system_message = """你是一个专业的AI图像生成提示词优化助手。你的任务是帮助用户优化他们的图像生成提示词，使其更加详细、具体和富有表现力。
-            
-优化提示词时请遵循以下原则：
-1. 保持用户原始意图不变
-2. 增加细节描述，如具体的物体、颜色、材质、光照、风格等
-3. 添加艺术风格描述，如"油画"、"水彩"、"科幻风格"、"写实风格"等
-4. 添加质量增强词，如"高清"、"4K"、"细节丰富"、"高质量"等
-5. 保持语言简洁明了
-6. 不要添加与原意相悖的内容"""
-
-            # 如果有人格预设，则添加到系统消息中
-            if persona_preset:
-                system_message += f"\n\n用户还提供了以下人格预设，请在优化时考虑这些要求：\n{persona_preset}"
-
-            system_message += "\n\n请直接返回优化后的提示词，不要添加任何解释或其他内容。"
-            
-            # 构造用户消息
-            user_message = f"请优化以下图像生成提示词：\n\n{current_prompt}"
-            
-            # 获取选择的模型
-            selected_model = self.deepseek_model.get()
-            
-            # 发送请求到DeepSeek API
-            response = client.chat.completions.create(
-                model=selected_model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=500,
-                temperature=0.7
-            )
-            
-            # 获取优化后的提示词
-            optimized_prompt = response.choices[0].message.content.strip()
+            # 使用共享的DeepSeek客户端，重复优化时无需重新建立连接
+            client = self.get_deepseek_client(api_key)
+            
+            # 发送流式请求到DeepSeek API，逐段获取优化后的提示词
+            optimized_prompt = stream_optimize_prompt(
+                client, current_prompt, persona_preset, selected_model,
+                on_delta=lambda text: self.queue_prompt_delta(cancel_event, text),
+                cancel_event=cancel_event,
+                on_usage=self.usage_tracker.recorder('deepseek', api_key, selected_model, kind='optimize'))
+        except OptimizationCancelled:
+            # 界面已在取消时恢复
+            return
+        except Exception as e:
+            self.root.after(0, lambda error=e: self._finish_prompt_optimization(
+                cancel_event, current_prompt, persona_preset, selected_model, None, error))
+            return
+        
+        self.root.after(0, lambda: self._finish_prompt_optimization(
+            cancel_event, current_prompt, persona_preset, selected_model, optimized_prompt, None))
+    
+    def queue_prompt_delta(self, cancel_event, text):
+        """从工作线程提交一段优化文本，按刷新间隔合并后写入输入框"""
+        if cancel_event.is_set():
+            return
+        with self._prompt_stream_lock:
+            self._pending_prompt_deltas.append((cancel_event, text))
+            if self._prompt_stream_scheduled:
+                return
+            self._prompt_stream_scheduled = True
+        self.root.after(PROMPT_STREAM_INTERVAL_MS, self._flush_prompt_deltas)
+    
+    def _flush_prompt_deltas(self):
+        """在Tk线程中把累积的文本片段追加到输入框"""
+        with self._prompt_stream_lock:
+            deltas = self._pending_prompt_deltas
+            self._pending_prompt_deltas = []
+            self._prompt_stream_scheduled = False
+        # 丢弃已取消或已结束的优化留下的片段
+        text = ''.join(delta for event, delta in deltas if event is self._optimize_cancel)
+        if not text:
+            return
+        if not self._optimize_stream_started:
+            # 收到第一段文本时才清空原提示词
+            self._optimize_stream_started = True
+            self.prompt_text.delete("1.0", tk.END)
+        self.prompt_text.insert(tk.END, text)
+        self.prompt_text.see(tk.END)
+    
+    def _end_prompt_optimization(self):
+        self._optimize_cancel = None
+        self.cancel_optimize_button.config(state=tk.DISABLED)
+    
+    def cancel_prompt_optimization(self):
+        """取消正在进行的提示词优化，恢复原提示词"""
+        if self._optimize_cancel is None:
+            return
+        self._optimize_cancel.set()
+        self._end_prompt_optimization()
+        self.prompt_text.delete("1.0", tk.END)
+        self.prompt_text.insert("1.0", self._optimize_original_prompt)
+        self.update_status("[信息] 已取消提示词优化，已恢复原提示词")
+        self.update_status("=" * 50)
+    
+    def _finish_prompt_optimization(self, cancel_event, current_prompt, persona_preset, selected_model,
+                                    optimized_prompt, error):
+        """在Tk线程中完成优化：写入最终结果或报告错误"""
+        if cancel_event is not self._optimize_cancel:
+            # 已被取消
+            return
+        self._end_prompt_optimization()
+        
+        if error is None and not optimized_prompt:
+            error = Exception("DeepSeek未返回任何内容")
+        
+        if error is None:
+            self.prompt_cache.put(current_prompt, persona_preset, selected_model, optimized_prompt)
             
-            # 将优化后的提示词更新到输入框
+            # 用完整结果覆盖流式写入的内容
             self.prompt_text.delete("1.0", tk.END)
             self.prompt_text.insert("1.0", optimized_prompt)
             
@@ -1351,31 +1787,329 @@ class VolcanoImageGenerator:
             self.update_status(f"[信息] 使用模型: {selected_model}")
             self.update_status(f"[信息] 原始提示词长度: {len(current_prompt)} 字符")
             self.update_status(f"[信息] 优化后提示词长度: {len(optimized_prompt)} 字符")
-            messagebox.showinfo("成功", "提示词已优化并更新到输入框中")
-            
-        except Exception as e:
-            error_str = str(e).lower()
-            if "401" in error_str or "unauthorized" in error_str or "invalid api key" in error_str:
-                self.update_status("[错误] DeepSeek API调用失败: API密钥无效")
-                self.update_status("[解决方案] 请检查您的DeepSeek API密钥是否正确")
-                messagebox.showerror("错误", "DeepSeek API密钥无效，请检查您的API密钥")
-            elif "403" in error_str or "forbidden" in error_str:
-                self.update_status("[错误] DeepSeek API调用失败: 访问被拒绝")
-                self.update_status("[解决方案] 请检查您的DeepSeek API密钥和权限设置")
-                messagebox.showerror("错误", "访问被拒绝，请检查您的API密钥和权限")
-            else:
-                self.update_status(f"[错误] DeepSeek API调用失败: {str(e)}")
-                self.update_status("[解决方案] 请检查网络连接和API密钥")
-                messagebox.showerror("错误", f"API调用失败: {str(e)}")
+        else:
+            # 流式输出中途失败时恢复原提示词
+            self.prompt_text.delete("1.0", tk.END)
+            self.prompt_text.insert("1.0", current_prompt)
+            self._report_deepseek_error(error)
         
         self.update_status("=" * 50)
         self.update_status("AI提示词优化完成!")
         self.update_status("=" * 50)
+    
+    def _check_openai_installed(self):
+        """检查是否安装了openai库（只查找模块，不导入），未安装时提示并返回False"""
+        if importlib.util.find_spec("openai") is not None:
+            return True
+        self.update_status("[错误] 未安装openai库，请运行 'pip install openai'")
+        messagebox.showerror("错误", "未安装openai库，请运行 'pip install openai'")
+        return False
+    
+    def _report_deepseek_error(self, error):
+        """在Tk线程中报告DeepSeek调用失败"""
+        error_str = str(error).lower()
+        if "401" in error_str or "unauthorized" in error_str or "invalid api key" in error_str:
+            self.update_status("[错误] DeepSeek API调用失败: API密钥无效")
+            self.update_status("[解决方案] 请检查您的DeepSeek API密钥是否正确")
+            messagebox.showerror("错误", "DeepSeek API密钥无效，请检查您的API密钥")
+        elif "403" in error_str or "forbidden" in error_str:
+            self.update_status("[错误] DeepSeek API调用失败: 访问被拒绝")
+            self.update_status("[解决方案] 请检查您的DeepSeek API密钥和权限设置")
+            messagebox.showerror("错误", "访问被拒绝，请检查您的API密钥和权限")
+        else:
+            self.update_status(f"[错误] DeepSeek API调用失败: {str(error)}")
+            self.update_status("[解决方案] 请检查网络连接和API密钥")
+            messagebox.showerror("错误", f"API调用失败: {str(error)}")
+    
+    def _start_variant_fanout(self, api_key, current_prompt, persona_preset, selected_model, variant_count):
+        """一次请求生成多个提示词变体，并把每个变体作为独立任务提交到生成队列"""
+        # 变体直接进入生成，先按当前界面参数检查生成设置
+        spec = self.collect_generation_spec(prompt=current_prompt)
+        if spec is None:
+            return
+        
+        # 变体结果以JSON列表缓存，键中包含变体数量
+        cache_model = f"{selected_model}|variants={variant_count}"
+        cached = None
+        if not self.force_new_optimization.get():
+            cached = self.prompt_cache.get(current_prompt, persona_preset, cache_model)
+        
+        self.update_status(f"[处理] 正在使用DeepSeek AI生成 {variant_count} 个提示词变体...")
+        cancel_event = threading.Event()
+        self._optimize_cancel = cancel_event
+        self._optimize_original_prompt = current_prompt
+        self._optimize_stream_started = False
+        self.cancel_optimize_button.config(state=tk.NORMAL)
+        
+        def run():
+            try:
+                if cached is not None:
+                    variants = json.loads(cached)
+                    self.update_status("[信息] 使用缓存的变体结果，未调用API")
+                else:
+                    client = self.get_deepseek_client(api_key)
+                    variants = optimize_prompt_variants(
+                        client, current_prompt, persona_preset, selected_model, variant_count,
+                        on_usage=self.usage_tracker.recorder('deepseek', api_key, selected_model,
+                                                             kind='variants'))
+                    self.prompt_cache.put(current_prompt, persona_preset, cache_model,
+                                          json.dumps(variants, ensure_ascii=False))
+            except Exception as e:
+                self.root.after(0, lambda error=e: self._finish_variant_fanout(
+                    cancel_event, spec, current_prompt, None, error))
+                return
+            self.root.after(0, lambda: self._finish_variant_fanout(
+                cancel_event, spec, current_prompt, variants, None))
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def _finish_variant_fanout(self, cancel_event, spec, current_prompt, variants, error):
+        """在Tk线程中提交所有变体的生成任务，结果在图库中按变体组归在一起"""
+        if cancel_event is not self._optimize_cancel:
+            # 已被取消
+            return
+        self._end_prompt_optimization()
+        
+        if error is not None:
+            self._report_deepseek_error(error)
+            return
+        
+        group_id = self.output_store.new_job_id()
+        jobs = []
+        self.update_status(f"[成功] 已生成 {len(variants)} 个提示词变体，全部加入生成队列:")
+        for index, variant in enumerate(variants):
+            self.update_status(f"  变体 {index+1}: {variant}")
+            jobs.append(dict(spec, prompt=variant, extra={
+                "source_prompt": current_prompt,
+                "variant_group": group_id,
+                "batch_id": group_id,
+                "variant_index": index,
+                "variant_count": len(variants),
+            }))
+        
+        # 队列满时在后台线程中等待提交，不阻塞界面
+        def submit_all():
+            for job in jobs:
+                self.job_queue.submit(job)
+        
+        thread = threading.Thread(target=submit_all)
+        thread.daemon = True
+        thread.start()
+
+    def batch_optimize_prompts(self):
+        """批量优化提示词文件（每行一条），结果按原顺序写入JSONL，可中断后继续"""
+        if self._batch_cancel is not None:
+            self.update_status("[信息] 已有批量任务正在进行中")
+            return
+        
+        # 检查是否安装了openai库
+        if not self._check_openai_installed():
+            return
+        
+        api_key = self.deepseek_api_key.get()
+        if not api_key:
+            self.update_status("[错误] 请先输入DeepSeek API密钥")
+            messagebox.showerror("错误", "请先输入DeepSeek API密钥")
+            return
+        
+        input_path = filedialog.askopenfilename(
+            title="选择提示词文件（每行一条）",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not input_path:
+            return
+        output_path = filedialog.asksaveasfilename(
+            title="保存优化结果（已存在时从中断处继续）",
+            initialfile=os.path.basename(default_output_path(input_path)),
+            initialdir=os.path.dirname(input_path),
+            defaultextension=".jsonl",
+            confirmoverwrite=False,
+            filetypes=[("JSON Lines", "*.jsonl")]
+        )
+        if not output_path:
+            return
+        
+        model = self.deepseek_model.get()
+        batch_id = self.output_store.new_job_id()
+        on_usage = self.usage_tracker.recorder('deepseek', api_key, model, log_each=False,
+                                               batch=batch_id, kind='batch_optimize')
+        if self.settings["batch_optimize_async"]:
+            optimizer = AsyncBatchOptimizer(
+                self.make_async_deepseek_client_factory(api_key), self.prompt_cache,
+                persona_preset=self.persona_preset.get("1.0", tk.END).strip(),
+                model=model,
+                max_concurrency=self.settings["batch_optimize_async_concurrency"],
+                requests_per_minute=self.settings["batch_optimize_rpm"],
+                dedup_threshold=self.settings["dedup_threshold"],
+                log=self.update_status,
+                on_usage=on_usage)
+        else:
+            optimizer = BatchOptimizer(
+                self.get_deepseek_client(api_key), self.prompt_cache,
+                persona_preset=self.persona_preset.get("1.0", tk.END).strip(),
+                model=model,
+                max_concurrency=self.settings["batch_optimize_concurrency"],
+                requests_per_minute=self.settings["batch_optimize_rpm"],
+                dedup_threshold=self.settings["dedup_threshold"],
+                log=self.update_status,
+                on_usage=on_usage)
+        cancel_event = threading.Event()
+        self._batch_cancel = cancel_event
+        
+        def run():
+            mode = "异步" if self.settings["batch_optimize_async"] else "多线程"
+            self.update_status(f"[处理] 开始批量优化提示词（{mode}）: {os.path.basename(input_path)}")
+            try:
+                succeeded, failed = optimizer.run(input_path, output_path, cancel_event)
+                self.update_status(f"[成功] 批量优化结束: 成功 {succeeded} 条，失败 {failed} 条，结果: {output_path}")
+            except Exception as e:
+                self.update_status(f"[错误] 批量优化失败: {str(e)}")
+            finally:
+                self._batch_cancel = None
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def run_optimize_generate_pipeline(self):
+        """批量优化提示词文件，每条优化完成后立即加入生成队列，两个阶段同时进行"""
+        if self._batch_cancel is not None:
+            self.update_status("[信息] 已有批量任务正在进行中")
+            return
+        
+        # 检查是否安装了openai库
+        if not self._check_openai_installed():
+            return
+        
+        api_key = self.deepseek_api_key.get()
+        if not api_key:
+            self.update_status("[错误] 请先输入DeepSeek API密钥")
+            messagebox.showerror("错误", "请先输入DeepSeek API密钥")
+            return
+        
+        # 先按当前界面参数检查生成设置，提示词由文件提供
+        base_spec = self.collect_generation_spec(prompt="-")
+        if base_spec is None:
+            return
+        
+        input_path = filedialog.askopenfilename(
+            title="选择提示词文件（每行一条）",
+            filetypes=[("Text files", "*.txt"), ("All files", "*.*")]
+        )
+        if not input_path:
+            return
+        dedup_threshold = self.settings["dedup_threshold"]
+        
+        client = self.get_deepseek_client(api_key)
+        model = self.deepseek_model.get()
+        # 优化和生成的用量记在同一批次下
+        batch_id = self.output_store.new_job_id()
+        optimizer = BatchOptimizer(
+            client, self.prompt_cache,
+            persona_preset=self.persona_preset.get("1.0", tk.END).strip(),
+            model=model,
+            max_concurrency=self.settings["batch_optimize_concurrency"],
+            requests_per_minute=self.settings["batch_optimize_rpm"],
+            log=self.update_status,
+            on_usage=self.usage_tracker.recorder('deepseek', api_key, model, log_each=False,
+                                                 batch=batch_id, kind='batch_optimize'))
+        
+        def make_job(index, prompt, optimized):
+            return dict(base_spec, prompt=optimized,
+                        extra={"source_prompt": prompt, "batch_index": index, "batch_id": batch_id})
+        
+        pipeline = OptimizeGeneratePipeline(optimizer, self.job_queue, make_job, log=self.update_status)
+        cancel_event = threading.Event()
+        self._batch_cancel = cancel_event
+        
+        def run():
+            try:
+                # 读取和去重在工作线程中进行，数万条提示词时需要数秒
+                try:
+                    prompts = dedupe_prompts(read_prompt_file(input_path), dedup_threshold, self.update_status)
+                except Exception as e:
+                    self.update_status(f"[错误] 读取提示词文件失败: {str(e)}")
+                    return
+                self.update_status(f"[处理] 流水线开始: {len(prompts)} 条提示词，优化完成后立即生成")
+                submitted, failed = pipeline.run(prompts, cancel_event)
+                self.update_status(f"[成功] 流水线优化阶段结束: 已提交生成 {submitted} 条，优化失败 {failed} 条")
+            except Exception as e:
+                self.update_status(f"[错误] 流水线执行失败: {str(e)}")
+            finally:
+                self._batch_cancel = None
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def run_sweep(self):
+        """按扫描定义（模板×参数轴）逐个展开生成任务并流式提交到生成队列"""
+        if self._batch_cancel is not None:
+            self.update_status("[信息] 已有批量任务正在进行中")
+            return
+        
+        # 界面当前参数作为基础任务，扫描轴覆盖其中的同名参数
+        base_spec = self.collect_generation_spec(prompt="-")
+        if base_spec is None:
+            return
+        
+        sweep_path = filedialog.askopenfilename(
+            title="选择参数扫描定义",
+            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+        )
+        if not sweep_path:
+            return
+        try:
+            sweep = load_sweep(sweep_path)
+        except Exception as e:
+            self.update_status(f"[错误] 读取扫描定义失败: {str(e)}")
+            return
+        
+        base_spec["extra"] = {"batch_id": self.output_store.new_job_id()}
+        cancel_event = threading.Event()
+        self._batch_cancel = cancel_event
+        
+        def run():
+            self.update_status(f"[处理] 参数扫描开始: 最多 {sweep_size(sweep)} 个组合，等价组合只生成一次")
+            submitted = 0
+            try:
+                for job in expand_sweep(sweep, base_spec):
+                    # 生成队列满时在此等待（背压），同时响应取消
+                    while not cancel_event.is_set() and not self.job_queue.submit(job, timeout=0.5):
+                        pass
+                    if cancel_event.is_set():
+                        break
+                    submitted += 1
+                    if submitted % 10 == 0:
+                        self.update_status(f"[信息] 参数扫描: 已提交 {submitted} 个任务")
+                self.update_status(f"[成功] 参数扫描提交结束: 共提交 {submitted} 个生成任务")
+            except Exception as e:
+                self.update_status(f"[错误] 参数扫描失败: {str(e)}")
+            finally:
+                self._batch_cancel = None
+        
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+    
+    def cancel_batch(self):
+        """取消进行中的批量优化、流水线或参数扫描，已完成的结果保留，排队中的生成任务被丢弃"""
+        if self._batch_cancel is None:
+            self.update_status("[信息] 没有进行中的批量任务")
+            return
+        self._batch_cancel.set()
+        dropped = self.job_queue.cancel_pending()
+        self.update_status(f"[信息] 正在取消批量任务...（已丢弃 {dropped} 个排队中的生成任务）")
 
 def main():
     root = tk.Tk()
     app = VolcanoImageGenerator(root)
     root.mainloop()
+    app.shutdown()
 
 if __name__ == "__main__":
+    # 封装环境中后处理进程池需要
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,184 @@
+"""近似重复提示词检测
+
+批量提示词中常有只差空白、标点或短语顺序的重复行，每一行都要花一次完整的生成。
+文本按逗号、顿号、分号和换行切成短语，短语内保持词序（中日韩文字每个字作为一个词），
+只有整个短语可以调换顺序；取每个短语内的词n-gram，用单次排列MinHash（分桶取最小值，空桶从相邻桶补齐）
+计算签名，再用LSH分段分桶找出候选对，最后用精确的Jaccard相似度确认。
+只依赖标准库，数万条提示词可在数秒内处理完。
+"""
+
+import re
+import zlib
+import unicodedata
+
+# 默认参数：64个MinHash分桶，分成8段、每段8个，相似度约0.77以上的文本大概率成为候选
+NUM_BINS = 64
+BANDS = 8
+NGRAM = 2   # 词n-gram长度，只在短语内部取，不跨越短语
+# 每条文本最多精确比较的候选数（按命中的段数从多到少），以及每个LSH桶最多记录的条目数，
+# 避免大量彼此相似但不重复的文本使比较次数退化为平方级
+MAX_CANDIDATES = 8
+MAX_BUCKET_SIZE = 64
+
+# 短语分隔符（NFKC之后全角逗号、分号已变为半角）
+_PHRASE_SEPARATORS = re.compile(r'[,、;\n]+')
+# 词：连续的字母或连续的数字，其余标点和空白忽略
+_WORDS = re.compile(r'[^\W\d_]+|\d+')
+# 中日韩文字没有空格分词，每个字作为一个词
+_CJK = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]')
+
+
+def _phrases(text):
+    """统一全半角和大小写后切分短语，返回每个短语的词列表（保持词序）"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    phrases = []
+    for phrase in _PHRASE_SEPARATORS.split(text):
+        words = []
+        for word in _WORDS.findall(phrase):
+            if _CJK.search(word):
+                words.extend(word)
+            else:
+                words.append(word)
+        if words:
+            phrases.append(words)
+    return phrases
+
+
+def normalize_for_dedup(text):
+    """规范化文本：短语内保持词序，只对整个短语排序，使逗号分隔的短语调换顺序后仍然相同"""
+    return ','.join(sorted(' '.join(words) for words in _phrases(text)))
+
+
+def shingles(text, n=NGRAM):
+    """各短语内的词n-gram集合，不足n个词的短语整体作为一个元素"""
+    result = set()
+    for words in _phrases(text):
+        if len(words) <= n:
+            result.add(' '.join(words))
+        else:
+            result.update(' '.join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return result
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+def signature(shingle_set, num_bins=NUM_BINS):
+    """单次排列MinHash签名：每个n-gram只哈希一次，按哈希值分桶后各桶取最小值
+
+    使用CRC32而不是内置 hash()：后者按进程随机化（PYTHONHASHSEED），同一输入在不同进程中
+    去重结果可能不同，而批量优化中断后继续时依赖去重结果只取决于输入。
+    """
+    bins = [None] * num_bins
+    for shingle in shingle_set:
+        value = zlib.crc32(shingle.encode('utf-8'))
+        index = value % num_bins
+        rest = value // num_bins
+        if bins[index] is None or rest < bins[index]:
+            bins[index] = rest
+    # 空桶用其后第一个非空桶的值补齐（带偏移以区分来源），保持签名的局部敏感性
+    if None in bins:
+        for index in range(num_bins):
+            if bins[index] is not None:
+                continue
+            for offset in range(1, num_bins):
+                donor = bins[(index + offset) % num_bins]
+                if donor is not None and not isinstance(donor, tuple):
+                    bins[index] = (offset, donor)
+                    break
+    return bins
+
+
+class NearDuplicateDetector:
+    def __init__(self, threshold=0.85, num_bins=NUM_BINS, bands=BANDS, ngram=NGRAM):
+        """流式近似重复检测器
+
+        Args:
+            threshold: 判定为重复的最低Jaccard相似度
+            num_bins: MinHash签名长度，需能被 bands 整除
+            bands: LSH分段数，段数越多候选越多、漏检越少
+            ngram: 词n-gram长度
+        """
+        if num_bins % bands:
+            raise ValueError("num_bins 必须能被 bands 整除")
+        self.threshold = threshold
+        self.num_bins = num_bins
+        self.bands = bands
+        self.rows = num_bins // bands
+        self.ngram = ngram
+        self._buckets = [{} for _ in range(bands)]   # 每段：段内签名元组 -> 已保留条目序号列表
+        self._shingles = []                          # 已保留条目的n-gram集合
+
+    def add(self, text):
+        """检查一条文本，重复时返回 (已保留条目的序号, 相似度)，否则保留该文本并返回None
+
+        保留的条目按加入顺序从0编号；重复的文本不会被保留，也不参与之后的比较。
+        """
+        shingle_set = shingles(text, self.ngram)
+        sig = signature(shingle_set, self.num_bins)
+        # 直接以段内签名元组作为桶键，按相等比较，与进程的哈希种子无关
+        keys = [tuple(sig[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+        hits = {}
+        for band, key in enumerate(keys):
+            for index in self._buckets[band].get(key, ()):
+                hits[index] = hits.get(index, 0) + 1
+        candidates = sorted(hits, key=lambda index: (-hits[index], index))[:MAX_CANDIDATES]
+        best = None
+        size = len(shingle_set)
+        for index in candidates:
+            other = self._shingles[index]
+            # 集合大小相差过大时相似度不可能达到阈值
+            if min(size, len(other)) < self.threshold * max(size, len(other)):
+                continue
+            similarity = jaccard(shingle_set, other)
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (index, similarity)
+        if best is not None:
+            return best
+
+        index = len(self._shingles)
+        self._shingles.append(shingle_set)
+        for band, key in enumerate(keys):
+            bucket = self._buckets[band].setdefault(key, [])
+            if len(bucket) < MAX_BUCKET_SIZE:
+                bucket.append(index)
+        return None
+
+
+def collapse_near_duplicates(texts, threshold=0.85):
+    """去除近似重复的文本，返回 (保留的文本列表, 重复列表)
+
+    重复列表中每项为 (原序号, 保留的原序号, 相似度)，保留的总是最先出现的那一条。
+    """
+    detector = NearDuplicateDetector(threshold)
+    kept = []
+    kept_positions = []
+    duplicates = []
+    for position, text in enumerate(texts):
+        match = detector.add(text)
+        if match is None:
+            kept.append(text)
+            kept_positions.append(position)
+        else:
+            duplicates.append((position, kept_positions[match[0]], match[1]))
+    return kept, duplicates
+
+
+def dedupe_prompts(prompts, threshold, log=None):
+    """批量任务入队前去除近似重复的提示词并记录日志，threshold 为0时不处理"""
+    if not threshold or threshold <= 0:
+        return list(prompts)
+    log = log or print
+    kept, duplicates = collapse_near_duplicates(prompts, threshold)
+    if duplicates:
+        log(f"[信息] 发现 {len(duplicates)} 条近似重复的提示词（相似度≥{threshold}），已合并，剩余 {len(kept)} 条")
+        for position, kept_position, similarity in duplicates[:5]:
+            log(f"  第 {position + 1} 行与第 {kept_position + 1} 行重复（{similarity:.2f}）: {prompts[position][:40]}")
+        if len(duplicates) > 5:
+            log(f"  ……另有 {len(duplicates) - 5} 条")
+    return kept
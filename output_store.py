@@ -0,0 +1,75 @@
+"""输出图像存储
+
+生成的图像按任务下载到输出目录，每张图像的信息（URL、本地路径、提示词和参数）
+以JSON行的形式追加到 index.jsonl 中，作为任务历史。
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+
+def group_key(record):
+    """记录所属的组：提示词变体按变体组归在一起，其余按任务"""
+    return record.get('variant_group') or record.get('job_id')
+
+
+class OutputStore:
+    def __init__(self, root_dir):
+        """初始化输出存储"""
+        self.root_dir = root_dir
+        self.index_file = os.path.join(root_dir, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._counter = 0
+        os.makedirs(root_dir, exist_ok=True)
+
+    def new_job_id(self):
+        """生成新的任务ID"""
+        with self._lock:
+            self._counter += 1
+            return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{self._counter:04d}"
+
+    def output_path(self, job_id, index, ext='.jpg'):
+        """获取任务第index张图像的保存路径"""
+        return os.path.join(self.root_dir, f"{job_id}_{index + 1}{ext}")
+
+    def add_record(self, record):
+        """追加一条图像记录"""
+        record = dict(record)
+        record.setdefault('created_at', datetime.now().isoformat(timespec='seconds'))
+        with self._lock:
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return record
+
+    def latest_group(self, min_images=2):
+        """最近一个至少包含 min_images 张图像的组（组图任务或提示词变体组）的记录，按序号排列"""
+        groups = {}
+        latest = None
+        for record in self.iter_records():
+            key = group_key(record)
+            if key is None:
+                continue
+            groups.setdefault(key, []).append(record)
+            if len(groups[key]) >= min_images:
+                latest = key
+        if latest is None:
+            return []
+        return sorted(groups[latest],
+                      key=lambda record: (record.get('variant_index', 0), record.get('index', 0)))
+
+    def iter_records(self):
+        """按写入顺序遍历所有记录"""
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 跳过写入中断产生的损坏行
+                    continue
@@ -0,0 +1,68 @@
+"""优化-生成流水线
+
+批量模式下，每条提示词一经DeepSeek优化完成就立即提交到生成队列，优化和生成两个阶段同时进行。
+生成队列是有界的：生成跟不上时，优化线程在提交处阻塞，不会无限堆积已优化的提示词。
+整批耗时接近较慢的那个阶段，而不是两个阶段之和。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class OptimizeGeneratePipeline:
+    def __init__(self, optimizer, job_queue, make_job, log=None):
+        """初始化流水线
+
+        Args:
+            optimizer: BatchOptimizer，提供带缓存和速率限制的 optimize()
+            job_queue: GenerationJobQueue
+            make_job: 由优化后的提示词构造生成任务字典的函数，参数为 (序号, 原提示词, 优化后的提示词)
+            log: 日志函数，参数为一条消息
+        """
+        self.optimizer = optimizer
+        self.job_queue = job_queue
+        self.make_job = make_job
+        self.log = log or print
+
+    def run(self, prompts, cancel_event=None):
+        """优化并提交所有提示词，返回 (已提交数, 优化失败数)
+
+        所有提示词都已提交到生成队列后返回，不等待生成完成。
+        """
+        cancel_event = cancel_event or threading.Event()
+        lock = threading.Lock()
+        counts = {'submitted': 0, 'failed': 0}
+
+        def process(index, prompt):
+            if cancel_event.is_set():
+                return
+            try:
+                optimized, _ = self.optimizer.optimize(prompt, cancel_event)
+            except Exception as e:
+                self.log(f"[错误] 提示词 {index + 1} 优化失败，跳过: {str(e)}")
+                with lock:
+                    counts['failed'] += 1
+                return
+            if optimized is None:
+                # 等待速率限制时被取消
+                return
+            job = self.make_job(index, prompt, optimized)
+            # 生成队列满时在此等待（背压），同时响应取消
+            while not cancel_event.is_set():
+                if self.job_queue.submit(job, timeout=0.5):
+                    with lock:
+                        counts['submitted'] += 1
+                        submitted = counts['submitted']
+                    self.log(f"[信息] 流水线: 第 {index + 1} 条提示词已优化并加入生成队列（已提交 {submitted}/{len(prompts)}）")
+                    return
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.optimizer.max_concurrency,
+                                    thread_name_prefix='pipeline') as executor:
+                futures = [executor.submit(process, index, prompt) for index, prompt in enumerate(prompts)]
+                for future in futures:
+                    future.result()
+        finally:
+            # optimize() 只定期写盘，结束时保存剩余的优化结果
+            self.optimizer.flush_cache()
+        return counts['submitted'], counts['failed']
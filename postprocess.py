@@ -0,0 +1,290 @@
+"""图像后处理
+
+格式转换（PNG/WebP/AVIF/JPEG）、提示词和参数元数据写入以及可选的缩小尺寸版本。
+4K图像的编码非常耗CPU，因此所有处理都在独立的进程池中执行，不阻塞界面和下载线程。
+进程池中执行的函数必须是模块级函数，以便被pickle传递给子进程。
+"""
+
+import os
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image, PngImagePlugin
+
+# 扩展名与PIL格式的对应关系
+FORMAT_BY_EXTENSION = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+    '.avif': 'AVIF',
+}
+
+# EXIF XPComment 标签，使用UTF-16LE编码，可保存中文提示词
+EXIF_XP_COMMENT = 0x9C9C
+
+# JPEG注释段（COM）的最大数据长度
+JPEG_COMMENT_MAX = 65533
+
+# IJG标准亮度量化表（质量50），用于估计源JPEG的编码质量
+_IJG_LUMINANCE = (
+    16, 11, 10, 16, 24, 40, 51, 61,
+    12, 12, 14, 19, 26, 58, 60, 55,
+    14, 13, 16, 24, 40, 57, 69, 56,
+    14, 17, 22, 29, 51, 87, 80, 62,
+    18, 22, 37, 56, 68, 109, 103, 77,
+    24, 35, 55, 64, 81, 104, 113, 92,
+    49, 64, 78, 87, 103, 121, 120, 101,
+    72, 92, 95, 98, 112, 100, 103, 99,
+)
+
+
+def _register_avif_plugin():
+    """Pillow 11.2 之前需要 pillow-avif-plugin 才能编码AVIF"""
+    try:
+        import pillow_avif  # noqa: F401
+    except ImportError:
+        pass
+
+
+_register_avif_plugin()
+
+
+def format_for_path(path):
+    """根据扩展名获取PIL格式名，未知扩展名返回None"""
+    return FORMAT_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def is_format_supported(fmt):
+    """检查当前Pillow是否能编码指定格式"""
+    Image.init()
+    return fmt in Image.SAVE
+
+
+def supported_save_filetypes():
+    """保存对话框中可用的文件类型"""
+    filetypes = [("JPEG files", "*.jpg"), ("PNG files", "*.png")]
+    if is_format_supported('WEBP'):
+        filetypes.append(("WebP files", "*.webp"))
+    if is_format_supported('AVIF'):
+        filetypes.append(("AVIF files", "*.avif"))
+    return filetypes
+
+
+# 输出记录中下载完成后才有的字段，不属于写入图像的元数据
+RECORD_ONLY_FIELDS = ('url', 'path', 'variants', 'created_at')
+
+
+def image_metadata(record):
+    """输出记录中写入图像的元数据部分（任务信息和序号）
+
+    下载后写入和另存为时都由此生成，两者一致时另存为才能判断源文件已带有相同的元数据。
+    """
+    if not record:
+        return record
+    return {name: value for name, value in record.items() if name not in RECORD_ONLY_FIELDS}
+
+
+def _metadata_text(metadata):
+    return json.dumps(metadata, ensure_ascii=False, sort_keys=True)
+
+
+def _exif_with_comment(image, text):
+    exif = image.getexif()
+    exif[EXIF_XP_COMMENT] = text.encode('utf-16le') + b'\x00\x00'
+    return exif
+
+
+def _save_image(image, dest_path, fmt, quality, metadata):
+    """按格式编码并写入元数据，先写临时文件再替换，避免留下半个文件"""
+    params = {}
+    if fmt == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        params.update(quality=quality, optimize=True)
+    elif fmt in ('WEBP', 'AVIF'):
+        params.update(quality=quality)
+    elif fmt == 'PNG':
+        params.update(optimize=False, compress_level=6)
+
+    if metadata:
+        text = _metadata_text(metadata)
+        if fmt == 'PNG':
+            info = PngImagePlugin.PngInfo()
+            info.add_itxt('parameters', text)
+            params['pnginfo'] = info
+        else:
+            params['exif'] = _exif_with_comment(image, text)
+            if fmt == 'JPEG':
+                params['comment'] = text.encode('utf-8')[:JPEG_COMMENT_MAX]
+
+    temp_path = dest_path + '.tmp'
+    image.save(temp_path, fmt, **params)
+    os.replace(temp_path, dest_path)
+
+
+def _ijg_table(quality):
+    """libjpeg按质量缩放后的亮度量化表（与Pillow保存时一致）"""
+    scale = 5000 // quality if quality < 50 else 200 - quality * 2
+    return [min(255, max(1, (value * scale + 50) // 100)) for value in _IJG_LUMINANCE]
+
+
+def _jpeg_quality(image):
+    """按亮度量化表反推JPEG的编码质量，不是标准量化表时返回None"""
+    tables = getattr(image, 'quantization', None)
+    if not tables or 0 not in tables:
+        return None
+    # 只比较表中的值集合，与表的存储顺序（自然顺序或zigzag）无关
+    actual = sorted(tables[0])
+    for quality in range(1, 101):
+        if sorted(_ijg_table(quality)) == actual:
+            return quality
+    return None
+
+
+def _can_copy_jpeg(image, quality, metadata):
+    """源JPEG的质量与要求一致、且已带有相同的元数据时，直接复制与重新编码结果等价"""
+    if _jpeg_quality(image) != quality:
+        return False
+    if not metadata:
+        return True
+    comment = image.info.get('comment')
+    if isinstance(comment, bytes):
+        comment = comment.decode('utf-8', 'replace')
+    return comment == _metadata_text(metadata)
+
+
+def _copy_file(src_path, dest_path):
+    """复制文件，先写临时文件再替换，避免留下半个文件"""
+    temp_path = dest_path + '.tmp'
+    with open(src_path, 'rb') as src, open(temp_path, 'wb') as dst:
+        dst.write(src.read())
+    os.replace(temp_path, dest_path)
+
+
+def _variant_path(dest_path, max_side):
+    base, ext = os.path.splitext(dest_path)
+    return f"{base}_{max_side}{ext}"
+
+
+def _save_variants(image, dest_path, fmt, quality, metadata, variants):
+    """生成最长边不超过给定尺寸的缩小版本"""
+    written = []
+    for max_side in variants:
+        if max(image.size) <= max_side:
+            continue
+        variant = image.copy()
+        variant.thumbnail((max_side, max_side), Image.LANCZOS)
+        path = _variant_path(dest_path, max_side)
+        _save_image(variant, path, fmt, quality, metadata)
+        written.append(path)
+    return written
+
+
+def _after_app_segments(data):
+    """SOI之后连续的APPn段（JFIF APP0、Exif APP1等）结束的位置"""
+    position = 2
+    while (position + 4 <= len(data) and data[position] == 0xFF
+           and 0xE0 <= data[position + 1] <= 0xEF):
+        length = int.from_bytes(data[position + 2:position + 4], 'big')
+        if length < 2 or position + 2 + length > len(data):
+            break
+        position += 2 + length
+    return position
+
+
+def embed_jpeg_comment(path, text):
+    """在JPEG的APPn段之后插入COM注释段，不重新编码图像数据
+
+    JFIF和Exif要求各自的APP段紧跟在SOI之后，COM段插在它们前面会使严格的读取器丢失这些信息。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] != b'\xff\xd8':
+        return False
+    payload = text.encode('utf-8')[:JPEG_COMMENT_MAX]
+    segment = b'\xff\xfe' + (len(payload) + 2).to_bytes(2, 'big') + payload
+    position = _after_app_segments(data)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data[:position] + segment + data[position:])
+    os.replace(temp_path, path)
+    return True
+
+
+def ingest_image(path, metadata=None, variants=()):
+    """下载完成后的处理：无损写入元数据，按需生成缩小版本。返回新写入的文件列表"""
+    written = []
+    if metadata and format_for_path(path) == 'JPEG':
+        embed_jpeg_comment(path, _metadata_text(metadata))
+    if variants:
+        with Image.open(path) as image:
+            image.load()
+            fmt = image.format or format_for_path(path) or 'JPEG'
+            written.extend(_save_variants(image, path, fmt, 90, metadata, variants))
+    return written
+
+
+def convert_image(src_path, dest_path, quality=90, metadata=None, variants=()):
+    """把源图像转换为目标路径扩展名对应的格式，返回写入的文件列表"""
+    fmt = format_for_path(dest_path)
+    if fmt is None:
+        raise ValueError(f"不支持的文件格式: {os.path.splitext(dest_path)[1]}")
+    if not is_format_supported(fmt):
+        raise ValueError(f"当前环境不支持编码 {fmt} 格式")
+
+    with Image.open(src_path) as image:
+        image.load()
+        if (image.format == 'JPEG' and fmt == 'JPEG' and not variants
+                and _can_copy_jpeg(image, quality, metadata)):
+            # 质量和元数据都与源文件相同时直接复制，避免重复有损编码；否则按设置重新编码
+            _copy_file(src_path, dest_path)
+            return [dest_path]
+        _save_image(image, dest_path, fmt, quality, metadata)
+        written = [dest_path]
+        written.extend(_save_variants(image, dest_path, fmt, quality, metadata, variants))
+    return written
+
+
+class PostProcessor:
+    def __init__(self, max_workers=None):
+        """初始化后处理进程池（首次提交任务时才启动子进程）"""
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # 下载线程和界面线程都会提交任务
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit_convert(self, src_path, dest_path, quality=90, metadata=None, variants=(), callback=None):
+        """提交格式转换任务，callback(written, error) 在进程池的结果线程中调用"""
+        future = self._get_executor().submit(convert_image, src_path, dest_path, quality,
+                                             metadata, tuple(variants))
+        return self._attach(future, callback)
+
+    def submit_ingest(self, path, metadata=None, variants=(), callback=None):
+        """提交下载后的处理任务，callback(written, error) 在进程池的结果线程中调用"""
+        future = self._get_executor().submit(ingest_image, path, metadata, tuple(variants))
+        return self._attach(future, callback)
+
+    def _attach(self, future, callback):
+        if callback:
+            def done(f):
+                if f.cancelled():
+                    return
+                error = f.exception()
+                callback(None if error else f.result(), error)
+            future.add_done_callback(done)
+        return future
+
+    def shutdown(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
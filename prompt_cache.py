@@ -0,0 +1,116 @@
+"""提示词优化结果缓存
+
+以（规范化后的提示词、人格预设、模型、系统消息版本）为键缓存DeepSeek的优化结果。
+条目超过有效期后失效，总数超过上限时淘汰最久未使用的条目。缓存保存在磁盘上，
+重启后再次优化相同的提示词可以立即返回，不再消耗token。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from prompt_optimizer import SYSTEM_MESSAGE_VERSION, normalize_text
+
+
+def make_cache_key(prompt, persona_preset, model, version=SYSTEM_MESSAGE_VERSION):
+    """计算缓存键"""
+    parts = [normalize_text(prompt), normalize_text(persona_preset), model, version]
+    return hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class PromptOptimizationCache:
+    def __init__(self, cache_file, ttl_seconds=7 * 24 * 3600, max_entries=1000, log=None):
+        """初始化优化结果缓存
+
+        Args:
+            cache_file: 缓存文件路径（JSON）
+            ttl_seconds: 条目有效期（秒）
+            max_entries: 最多保留的条目数
+            log: 日志函数，参数为一条消息
+        """
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.log = log or print
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # 写盘不持有 _lock，写盘期间不阻塞查找和写入
+        self._dirty = False
+        self._entries = OrderedDict()   # 键 -> {"result", "created_at"}，按最近使用排序
+        self._load()
+
+    def get(self, prompt, persona_preset, model):
+        """查找缓存的优化结果，未命中或已过期时返回None"""
+        key = make_cache_key(prompt, persona_preset, model)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry['created_at'] > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry['result']
+
+    def put(self, prompt, persona_preset, model, result, save=True):
+        """保存优化结果并写入磁盘
+
+        批量任务传 save=False 只更新内存并标记为待保存，由调用方定期或结束时调用 flush()，
+        避免每条结果都重写整个缓存文件。
+        """
+        key = make_cache_key(prompt, persona_preset, model)
+        with self._lock:
+            self._entries[key] = {'result': result, 'created_at': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+        if save:
+            self.flush()
+
+    def flush(self):
+        """有未保存的修改时写入磁盘"""
+        # 取快照和写盘都在 _save_lock 内，较旧的快照不会覆盖较新的
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                entries = list(self._entries.items())
+                self._dirty = False
+            self._write(entries)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.flush()
+
+    def _load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            self.log(f"[警告] 读取提示词优化缓存失败: {str(e)}")
+            return
+        now = time.time()
+        # 文件中按最近使用顺序保存，跳过已过期的条目
+        for key, entry in saved.get('entries', []):
+            if now - entry.get('created_at', 0) <= self.ttl_seconds:
+                self._entries[key] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _write(self, entries):
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp_file = self.cache_file + '.tmp'
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'entries': entries}, f, ensure_ascii=False)
+            os.replace(temp_file, self.cache_file)
+        except OSError as e:
+            self.log(f"[警告] 保存提示词优化缓存失败: {str(e)}")
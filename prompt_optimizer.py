@@ -0,0 +1,169 @@
+"""DeepSeek提示词优化
+
+构造提示词优化使用的系统消息和用户消息，并执行一次优化请求。
+系统消息的内容一旦修改，需要递增 SYSTEM_MESSAGE_VERSION，使旧的缓存结果失效。
+"""
+
+import re
+import json
+
+# 系统消息版本，修改下面的优化原则时递增
+SYSTEM_MESSAGE_VERSION = 1
+
+BASE_SYSTEM_MESSAGE = """你是一个专业的AI图像生成提示词优化助手。你的任务是帮助用户优化他们的图像生成提示词，使其更加详细、具体和富有表现力。
+
+优化提示词时请遵循以下原则：
+1. 保持用户原始意图不变
+2. 增加细节描述，如具体的物体、颜色、材质、光照、风格等
+3. 添加艺术风格描述，如"油画"、"水彩"、"科幻风格"、"写实风格"等
+4. 添加质量增强词，如"高清"、"4K"、"细节丰富"、"高质量"等
+5. 保持语言简洁明了
+6. 不要添加与原意相悖的内容"""
+
+
+def normalize_text(text):
+    """去除首尾空白并合并连续空白，用于缓存键"""
+    return re.sub(r'\s+', ' ', (text or '').strip())
+
+
+def build_system_message(persona_preset=""):
+    """构造提示词优化的系统消息"""
+    system_message = BASE_SYSTEM_MESSAGE
+
+    # 如果有人格预设，则添加到系统消息中
+    if persona_preset:
+        system_message += f"\n\n用户还提供了以下人格预设，请在优化时考虑这些要求：\n{persona_preset}"
+
+    system_message += "\n\n请直接返回优化后的提示词，不要添加任何解释或其他内容。"
+    return system_message
+
+
+def build_messages(prompt, persona_preset=""):
+    """构造发送给DeepSeek的消息列表"""
+    return [
+        {"role": "system", "content": build_system_message(persona_preset)},
+        {"role": "user", "content": f"请优化以下图像生成提示词：\n\n{prompt}"}
+    ]
+
+
+def optimize_prompt(client, prompt, persona_preset, model, on_usage=None):
+    """发送一次优化请求并返回优化后的提示词，on_usage(usage) 接收本次请求的用量"""
+    response = client.chat.completions.create(
+        model=model,
+        messages=build_messages(prompt, persona_preset),
+        max_tokens=500,
+        temperature=0.7
+    )
+    if on_usage is not None:
+        on_usage(getattr(response, 'usage', None))
+    return response.choices[0].message.content.strip()
+
+
+class OptimizationCancelled(Exception):
+    """流式优化被用户取消"""
+
+
+def stream_optimize_prompt(client, prompt, persona_preset, model, on_delta, cancel_event=None, on_usage=None):
+    """以流式方式发送优化请求，每收到一段文本调用 on_delta(text)，返回完整的优化结果
+
+    cancel_event 被设置后关闭连接并抛出 OptimizationCancelled。
+    deepseek-reasoner 先输出的推理内容（reasoning_content）不计入结果。
+    on_usage 不为None时请求在流末尾附带用量（stream_options.include_usage），收到后调用 on_usage(usage)。
+    """
+    extra = {}
+    if on_usage is not None:
+        # 旧版openai库没有 stream_options 参数，通过请求体传递
+        extra['extra_body'] = {"stream_options": {"include_usage": True}}
+    stream = client.chat.completions.create(
+        model=model,
+        messages=build_messages(prompt, persona_preset),
+        max_tokens=500,
+        temperature=0.7,
+        stream=True,
+        **extra
+    )
+    parts = []
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                raise OptimizationCancelled()
+            # 用量在最后一个不含choices的片段中
+            usage = getattr(chunk, 'usage', None)
+            if usage is not None and on_usage is not None:
+                on_usage(usage)
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                parts.append(content)
+                on_delta(content)
+    finally:
+        # openai 1.3.6 的 Stream 没有 close()，关闭底层HTTP响应以断开连接
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+        else:
+            stream.response.close()
+    return ''.join(parts).strip()
+
+
+def build_variant_messages(prompt, persona_preset, count):
+    """构造一次请求生成多个不同变体的消息列表，要求以JSON返回"""
+    system_message = BASE_SYSTEM_MESSAGE
+
+    if persona_preset:
+        system_message += f"\n\n用户还提供了以下人格预设，请在优化时考虑这些要求：\n{persona_preset}"
+
+    system_message += (f"\n\n请给出 {count} 个风格、构图或细节明显不同的优化版本，"
+                       f"只返回JSON对象，格式为：{{\"variants\": [\"提示词1\", \"提示词2\", ...]}}，"
+                       f"不要添加任何解释或其他内容。")
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": f"请为以下图像生成提示词给出 {count} 个不同的优化版本：\n\n{prompt}"}
+    ]
+
+
+def parse_variants(content, count):
+    """从模型返回的JSON中取出去重后的变体列表，最多count个"""
+    content = (content or '').strip()
+    # 模型偶尔会在JSON外包裹代码块或说明文字
+    start = content.find('{')
+    end = content.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError("DeepSeek未返回JSON格式的变体列表")
+    data = json.loads(content[start:end + 1])
+    variants = []
+    for item in data.get('variants', []):
+        text = str(item).strip()
+        if text and text not in variants:
+            variants.append(text)
+    if not variants:
+        raise ValueError("DeepSeek返回的变体列表为空")
+    return variants[:count]
+
+
+def optimize_prompt_variants(client, prompt, persona_preset, model, count, on_usage=None):
+    """一次请求生成count个不同的优化变体，返回字符串列表，on_usage(usage) 接收本次请求的用量"""
+    response = client.chat.completions.create(
+        model=model,
+        messages=build_variant_messages(prompt, persona_preset, count),
+        max_tokens=min(500 * count, 8000),
+        temperature=1.0,
+        response_format={"type": "json_object"}
+    )
+    if on_usage is not None:
+        on_usage(getattr(response, 'usage', None))
+    return parse_variants(response.choices[0].message.content, count)
+
+
+async def async_optimize_prompt(client, prompt, persona_preset, model, on_usage=None):
+    """使用异步客户端发送一次优化请求并返回优化后的提示词"""
+    response = await client.chat.completions.create(
+        model=model,
+        messages=build_messages(prompt, persona_preset),
+        max_tokens=500,
+        temperature=0.7
+    )
+    if on_usage is not None:
+        on_usage(getattr(response, 'usage', None))
+    return response.choices[0].message.content.strip()
@@ -0,0 +1,173 @@
+"""可续传、带校验的文件下载
+
+下载先写入 <目标路径>.part 临时文件。连接中断后使用 HTTP Range 请求只补下缺失的部分；
+全部下载完成后校验文件长度以及内容哈希（Content-MD5 或MD5形式的ETag），
+校验通过才重命名为目标文件。
+"""
+
+import os
+import re
+import time
+import base64
+import hashlib
+
+import requests
+
+# 下载时每次写入的块大小
+CHUNK_SIZE = 256 * 1024
+
+# 值得重试的HTTP状态码
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    """下载失败"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _parse_content_range(value):
+    """解析 Content-Range: bytes start-end/total，返回 (start, total)，total未知时为None"""
+    match = re.match(r'bytes\s+(\d+)-(\d+)/(\d+|\*)', value or '')
+    if not match:
+        return None, None
+    total = match.group(3)
+    return int(match.group(1)), (int(total) if total != '*' else None)
+
+
+def _md5_from_headers(etag, content_md5):
+    """从响应头中获取内容MD5（十六进制），没有可用的MD5时返回None"""
+    if content_md5:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            pass
+    if etag:
+        # 弱ETag和分片上传的ETag（带 -N 后缀）不是内容MD5
+        value = etag.strip()
+        if not value.startswith('W/'):
+            value = value.strip('"')
+            if re.fullmatch(r'[0-9a-fA-F]{32}', value):
+                return value.lower()
+    return None
+
+
+def _file_md5(path):
+    """计算文件MD5"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def download_file(url, dest_path, max_retries=4, timeout=(10, 60), log=None, session=None):
+    """下载URL到dest_path，支持断点续传和完整性校验
+
+    Args:
+        url: 下载地址
+        dest_path: 目标文件路径
+        max_retries: 连接中断或服务端临时错误时的最大重试次数
+        timeout: requests超时设置 (连接超时, 读取超时)
+        log: 日志函数，参数为一条消息
+        session: 可选的requests.Session，用于复用连接
+
+    Raises:
+        DownloadError: 重试耗尽、服务端返回错误或校验失败
+    """
+    log = log or (lambda message: None)
+    part_path = dest_path + '.part'
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+
+    # 内容校验失败说明已写入的数据损坏，只能整体重新下载一次
+    for verify_attempt in range(2):
+        expected_total, expected_md5 = _download_part(url, part_path, max_retries, timeout, log,
+                                                      session or requests)
+        size = os.path.getsize(part_path)
+        if expected_total is not None and size != expected_total:
+            os.remove(part_path)
+            error = DownloadError(f"文件长度校验失败: {size} != {expected_total}")
+        elif expected_md5 and _file_md5(part_path) != expected_md5:
+            os.remove(part_path)
+            error = DownloadError("内容哈希校验失败")
+        else:
+            os.replace(part_path, dest_path)
+            return dest_path
+        if verify_attempt == 0:
+            log(f"[下载] {str(error)}，重新下载: {os.path.basename(dest_path)}")
+    raise error
+
+
+def _download_part(url, part_path, max_retries, timeout, log, http):
+    """下载到临时文件，中断后按Range续传，返回 (预期总长度, 预期MD5)"""
+    expected_total = None
+    validator = None   # 用于 If-Range 的 ETag 或 Last-Modified
+    expected_md5 = None
+    attempt = 0
+
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if expected_total is not None and offset == expected_total:
+            return expected_total, expected_md5
+
+        headers = {}
+        if offset > 0:
+            headers['Range'] = f'bytes={offset}-'
+            if validator:
+                headers['If-Range'] = validator
+
+        try:
+            with http.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                status = response.status_code
+                if status == 416 and offset > 0:
+                    # 临时文件已经不小于服务端文件，丢弃后重新下载
+                    log(f"[下载] 续传范围无效，重新下载: {os.path.basename(part_path)}")
+                    os.remove(part_path)
+                    continue
+                if status == 206:
+                    start, total = _parse_content_range(response.headers.get('Content-Range'))
+                    if start != offset:
+                        # 无法安全拼接，丢弃临时文件后从头下载
+                        os.remove(part_path)
+                        raise DownloadError(f"续传起点不一致: 请求 {offset}, 返回 {start}")
+                    mode = 'ab'
+                    if total is not None:
+                        expected_total = total
+                elif status == 200:
+                    # 服务端不支持Range或文件已变化，从头下载
+                    if offset > 0:
+                        log(f"[下载] 服务端未返回部分内容，从头下载: {os.path.basename(part_path)}")
+                    mode = 'wb'
+                    length = response.headers.get('Content-Length')
+                    expected_total = int(length) if length and length.isdigit() else None
+                else:
+                    raise DownloadError(f"HTTP {status}", status_code=status)
+
+                validator = response.headers.get('ETag') or response.headers.get('Last-Modified') or validator
+                # 206响应的 Content-MD5 只对应本次返回的部分内容，只有200响应的才是整个文件的MD5
+                content_md5 = response.headers.get('Content-MD5') if status == 200 else None
+                expected_md5 = _md5_from_headers(response.headers.get('ETag'), content_md5) or expected_md5
+
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+
+            size = os.path.getsize(part_path)
+            if expected_total is None or size >= expected_total:
+                return expected_total, expected_md5
+            # 连接提前关闭，下一轮只请求缺失的部分
+            raise DownloadError(f"连接中断: 已下载 {size}/{expected_total} 字节")
+
+        except (requests.RequestException, OSError, DownloadError) as e:
+            status = getattr(e, 'status_code', None)
+            if status is not None and status not in RETRYABLE_STATUS:
+                raise
+            attempt += 1
+            if attempt > max_retries:
+                raise DownloadError(f"下载失败，已重试 {max_retries} 次: {str(e)}", status_code=status)
+            delay = min(2 ** attempt, 30)
+            log(f"[下载] {str(e)}，{delay} 秒后续传 ({attempt}/{max_retries})")
+            time.sleep(delay)
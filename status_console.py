@@ -0,0 +1,162 @@
+"""有界状态控制台
+
+状态文本框只保留最近N行，超出的旧行写入滚动日志文件，
+使长时间运行后内存占用和重绘开销保持稳定。支持按级别（信息、错误、网络）过滤和在缓冲区内搜索。
+"""
+
+import os
+import logging
+import tkinter as tk
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+# 日志级别
+LEVEL_INFO = "info"
+LEVEL_ERROR = "error"
+LEVEL_NETWORK = "network"
+
+# 过滤选项（显示名称 -> 级别，None表示全部）
+LEVEL_FILTERS = {
+    "全部": None,
+    "信息": LEVEL_INFO,
+    "错误": LEVEL_ERROR,
+    "网络": LEVEL_NETWORK,
+}
+
+# 根据消息前缀判断级别
+ERROR_PREFIXES = ("[错误]", "[异常]", "[异常详情]", "[告警]")
+NETWORK_PREFIXES = ("[网络]", "[下载]", "[流式]")
+
+
+def classify_message(message):
+    """根据消息前缀判断日志级别"""
+    text = message.lstrip()
+    if text.startswith(ERROR_PREFIXES) or text.startswith("Traceback"):
+        return LEVEL_ERROR
+    if text.startswith(NETWORK_PREFIXES):
+        return LEVEL_NETWORK
+    return LEVEL_INFO
+
+
+class StatusConsole:
+    def __init__(self, text_widget, max_lines=2000, log_file=None, log_max_bytes=5 * 1024 * 1024, log_backups=3):
+        """初始化状态控制台
+
+        Args:
+            text_widget: 用于显示的Text控件
+            max_lines: 缓冲区和控件中保留的最大行数
+            log_file: 溢出行写入的日志文件路径，为None时直接丢弃
+            log_max_bytes: 单个日志文件的最大字节数
+            log_backups: 保留的历史日志文件个数
+        """
+        self.text = text_widget
+        self.max_lines = max(100, max_lines)
+        self.buffer = deque()
+        self.level_filter = None
+        self._widget_lines = 0
+
+        self.text.tag_configure(LEVEL_ERROR, foreground="red")
+        self.text.tag_configure(LEVEL_NETWORK, foreground="#1f5fbf")
+        self.text.tag_configure("match", background="yellow")
+
+        self._spill_logger = None
+        if log_file:
+            try:
+                os.makedirs(os.path.dirname(log_file), exist_ok=True)
+                handler = RotatingFileHandler(log_file, maxBytes=log_max_bytes,
+                                              backupCount=log_backups, encoding="utf-8")
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                self._spill_logger = logging.getLogger(f"status_console.{id(self)}")
+                self._spill_logger.setLevel(logging.INFO)
+                self._spill_logger.propagate = False
+                self._spill_logger.addHandler(handler)
+            except Exception as e:
+                print(f"创建状态日志文件失败: {str(e)}")
+
+    def _visible(self, level):
+        return self.level_filter is None or self.level_filter == level
+
+    def _spill(self, level, line):
+        if self._spill_logger:
+            self._spill_logger.info(f"[{level}] {line}")
+
+    def append_batch(self, messages):
+        """追加一批消息（多行消息按行拆分），只触发一次控件插入"""
+        insert_args = []
+        visible_count = 0
+        for message in messages:
+            level = classify_message(message)
+            for line in message.split("\n"):
+                self.buffer.append((level, line))
+                if self._visible(level):
+                    insert_args.extend((line + "\n", level))
+                    visible_count += 1
+
+        # 超出容量的旧行写入日志文件
+        while len(self.buffer) > self.max_lines:
+            self._spill(*self.buffer.popleft())
+
+        if insert_args:
+            self.text.insert(tk.END, *insert_args)
+            self._widget_lines += visible_count
+            self._trim_widget()
+            self.text.see(tk.END)
+
+    def _trim_widget(self):
+        """删除控件中超出最大行数的旧行"""
+        excess = self._widget_lines - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self._widget_lines -= excess
+
+    def set_filter(self, level):
+        """设置级别过滤（None表示全部）并按缓冲区重新渲染"""
+        self.level_filter = level
+        self.text.delete("1.0", tk.END)
+        insert_args = []
+        for line_level, line in self.buffer:
+            if self._visible(line_level):
+                insert_args.extend((line + "\n", line_level))
+        self._widget_lines = len(insert_args) // 2
+        if insert_args:
+            self.text.insert(tk.END, *insert_args)
+        self.text.see(tk.END)
+
+    def search(self, keyword):
+        """高亮当前显示内容中的关键字并定位到第一个匹配，返回匹配数"""
+        self.text.tag_remove("match", "1.0", tk.END)
+        if not keyword:
+            return 0
+        count = 0
+        first = None
+        index = "1.0"
+        while True:
+            index = self.text.search(keyword, index, stopindex=tk.END, nocase=True)
+            if not index:
+                break
+            end = f"{index}+{len(keyword)}c"
+            self.text.tag_add("match", index, end)
+            if first is None:
+                first = index
+            count += 1
+            index = end
+        if first is not None:
+            self.text.see(first)
+        return count
+
+    def clear(self):
+        """清空缓冲区和控件，已有内容写入日志文件"""
+        while self.buffer:
+            self._spill(*self.buffer.popleft())
+        self.text.delete("1.0", tk.END)
+        self._widget_lines = 0
+
+    def close(self):
+        """退出时把缓冲区内容写入日志文件"""
+        for level, line in self.buffer:
+            self._spill(level, line)
+        self.buffer.clear()
+        if self._spill_logger:
+            for handler in list(self._spill_logger.handlers):
+                handler.close()
+                self._spill_logger.removeHandler(handler)
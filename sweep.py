@@ -0,0 +1,114 @@
+"""模板与参数扫描
+
+扫描定义是一个JSON文件，包含带占位符的提示词模板和若干参数轴，例如：
+
+    {
+        "name": "风格测试",
+        "template": "{subject}，{style}风格",
+        "axes": {
+            "subject": ["一只猫", "一座城堡"],
+            "style": ["油画", "水彩"],
+            "size": ["1K", "2K", "4K"],
+            "max_images": [1, 4],
+            "reference_images": [[], ["a.jpg", "b.jpg"]]
+        }
+    }
+
+名称与生成参数相同的轴（见 PARAM_AXES）覆盖任务参数，其余轴填入模板占位符；
+模板中也可以引用参数轴（如 "{subject}，{size}"），占位符必须是轴名，不能是位置占位符 {}、{0}。
+展开通过生成器逐个产生任务，不会构造完整的笛卡尔积列表；等价的任务（渲染后提示词和有效参数都相同）只产生一次。
+"""
+
+import json
+import hashlib
+import itertools
+import string
+
+from prompt_optimizer import normalize_text
+
+# 可作为扫描轴的生成参数
+PARAM_AXES = ("model", "size", "max_images", "watermark", "sequential", "mode", "reference_images", "image_path")
+
+
+def load_sweep(path):
+    """读取并检查扫描定义"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        sweep = json.load(f)
+    template = sweep.get('template')
+    axes = sweep.get('axes', {})
+    if not template or not isinstance(template, str):
+        raise ValueError("扫描定义缺少提示词模板 template")
+    if not isinstance(axes, dict):
+        raise ValueError("扫描定义的 axes 必须是对象")
+    for name, values in axes.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"参数轴 {name} 必须是非空列表")
+    for _, field, _, _ in string.Formatter().parse(template):
+        if field is not None and (field == '' or field.split('.')[0].split('[')[0].isdigit()):
+            raise ValueError("模板不能使用位置占位符 {} 或 {0}，请使用参数轴名称")
+    missing = template_fields(template) - set(axes)
+    if missing:
+        raise ValueError(f"模板中的占位符没有对应的参数轴: {', '.join(sorted(missing))}")
+    return sweep
+
+
+def template_fields(template):
+    """模板中用到的占位符名称"""
+    return {field.split('.')[0].split('[')[0]
+            for _, field, _, _ in string.Formatter().parse(template) if field}
+
+
+def sweep_size(sweep):
+    """展开前的组合总数（去重前的上限）"""
+    total = 1
+    for values in sweep.get('axes', {}).values():
+        total *= len(values)
+    return total
+
+
+def _effective_params(job):
+    """任务中真正影响生成结果的参数，用于判断等价"""
+    mode = job.get('mode', '')
+    # 与 _run_generation_job 一致：多图参考模式固定组图与否，其余模式由连续生成开关决定
+    multi = mode == 'multi_img2img_multi' or (bool(job.get('sequential')) and mode != 'multi_img2img_single')
+    return {
+        'prompt': normalize_text(job.get('prompt')),
+        'model': job.get('model'),
+        'size': job.get('size'),
+        'watermark': job.get('watermark'),
+        'mode': mode,
+        'sequential': multi,
+        # 只有组图时 max_images 才有意义
+        'max_images': job.get('max_images') if multi else None,
+        'images': (job.get('image_path') if mode.startswith('img2img')
+                   else sorted(job.get('reference_images') or []) if mode.startswith('multi_img2img')
+                   else None),
+    }
+
+
+def expand_sweep(sweep, base_job):
+    """逐个产生扫描展开后的生成任务字典，跳过与已产生任务等价的组合
+
+    Args:
+        sweep: load_sweep 返回的扫描定义
+        base_job: 基础任务字典（界面当前参数），扫描轴覆盖其中的同名参数
+    """
+    template = sweep['template']
+    axes = sweep.get('axes', {})
+    names = list(axes)
+    seen = set()   # 只保存等价键的摘要，内存与去重后的任务数成正比
+    for values in itertools.product(*(axes[name] for name in names)):
+        combo = dict(zip(names, values))
+        job = dict(base_job)
+        for name, value in combo.items():
+            if name in PARAM_AXES:
+                job[name] = value
+        # 模板可引用任意轴，包括参数轴
+        job['prompt'] = template.format_map(combo)
+        digest = hashlib.sha1(json.dumps(_effective_params(job), sort_keys=True,
+                                         ensure_ascii=False).encode('utf-8')).digest()
+        if digest in seen:
+            continue
+        seen.add(digest)
+        job['extra'] = dict(base_job.get('extra', {}), sweep=sweep.get('name', ''), sweep_params=combo)
+        yield job
@@ -0,0 +1,121 @@
+"""缩略图服务
+
+在后台线程中生成缩略图：JPEG使用draft模式直接按缩小比例解码（DCT缩放），
+避免完整解码20MP/4K原图。缩略图按文件内容哈希缓存在共享的图像缓存和磁盘中，
+再次选择同一图像或浏览历史时可以立即显示。
+解码在解码服务的线程池中进行，回调得到的是可直接创建PhotoImage的RGBA缓冲区（DecodedImage）。
+"""
+
+import os
+import hashlib
+import threading
+
+from PIL import Image
+
+from decode_service import DecodedImage
+
+
+def _file_key(path):
+    """文件的快速标识（路径、大小、修改时间），用于复用已计算的内容哈希"""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def decode_thumbnail(path, size):
+    """以尽量低的分辨率解码图像并缩放到不超过size"""
+    with Image.open(path) as image:
+        # 仅对JPEG生效：按1/2、1/4、1/8比例解码，结果仍不小于目标尺寸
+        image.draft('RGB', size)
+        image.thumbnail(size, Image.LANCZOS)
+        # 返回副本，关闭文件后原图像对象不再可用
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            return image.convert('RGBA')
+        return image.copy()
+
+
+class ThumbnailService:
+    def __init__(self, decode_service, image_cache, cache_dir, log=None):
+        """初始化缩略图服务
+
+        Args:
+            decode_service: DecodeService，提供后台线程池并把结果交回Tk线程
+            image_cache: ImageCache，内存中的缩略图按解码后大小计入其字节预算
+            cache_dir: 磁盘缓存目录
+            log: 日志函数，参数为一条消息
+        """
+        self.decode_service = decode_service
+        self.image_cache = image_cache
+        self.cache_dir = cache_dir
+        self.log = log or print
+        self._lock = threading.Lock()
+        self._hashes = {}              # 文件快速标识 -> 内容哈希
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def request(self, path, size, callback):
+        """请求缩略图，callback(decoded, error) 在Tk线程中调用，decoded为DecodedImage
+
+        内存缓存命中时立即同步回调，否则在后台线程中生成。
+        """
+        size = (int(size[0]), int(size[1]))
+        decoded = self._memory_lookup(path, size)
+        if decoded is not None:
+            callback(decoded, None)
+            return
+        self.decode_service.run(self._load, path, size, callback=callback)
+
+    def _memory_lookup(self, path, size):
+        try:
+            file_key = _file_key(path)
+        except OSError:
+            return None
+        with self._lock:
+            content_hash = self._hashes.get(file_key)
+        if content_hash is None:
+            return None
+        return self.image_cache.get(('thumbnail', content_hash, size))
+
+    def _content_hash(self, path):
+        file_key = _file_key(path)
+        with self._lock:
+            content_hash = self._hashes.get(file_key)
+        if content_hash is None:
+            content_hash = _hash_file(path)
+            with self._lock:
+                self._hashes[file_key] = content_hash
+        return content_hash
+
+    def _disk_path(self, content_hash, size):
+        return os.path.join(self.cache_dir, f"{content_hash}_{size[0]}x{size[1]}.png")
+
+    def _load(self, path, size):
+        """后台线程：依次查找内存缓存、磁盘缓存，最后解码原图"""
+        content_hash = self._content_hash(path)
+        key = ('thumbnail', content_hash, size)
+        decoded = self.image_cache.get(key)
+        if decoded is not None:
+            return decoded
+
+        disk_path = self._disk_path(content_hash, size)
+        if os.path.exists(disk_path):
+            with Image.open(disk_path) as cached:
+                cached.load()
+                image = cached.copy()
+        else:
+            image = decode_thumbnail(path, size)
+            try:
+                temp_path = disk_path + '.tmp'
+                image.save(temp_path, 'PNG')
+                os.replace(temp_path, disk_path)
+            except OSError as e:
+                self.log(f"[警告] 写入缩略图缓存失败: {str(e)}")
+        decoded = DecodedImage.from_image(image)
+        decoded.key = key
+        return self.image_cache.put(key, decoded, decoded.nbytes)
@@ -0,0 +1,165 @@
+"""用量统计
+
+记录每次请求返回的用量：方舟图像生成的 usage（生成图像数、tokens），DeepSeek的 response.usage（输入/输出tokens）。
+每条记录以JSON行追加到输出目录的 usage.jsonl 中，通过 job_id 与任务历史（index.jsonl）对应，
+可按密钥、小时或批次汇总，用于估算成本和按配额调整并发数。
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+
+# 汇总时累加的用量字段
+TOTAL_FIELDS = ('requests', 'images', 'prompt_tokens', 'completion_tokens', 'output_tokens', 'total_tokens')
+
+# 汇总方式 -> 分组函数
+GROUP_BY = {
+    'key': lambda entry: f"{entry.get('service')} {entry.get('key')}",
+    'hour': lambda entry: entry.get('time', '')[:13].replace('T', ' ') + ":00",
+    'batch': lambda entry: entry.get('batch'),
+    'model': lambda entry: entry.get('model'),
+}
+
+
+def key_fingerprint(api_key):
+    """密钥的显示标识，只保留末4位"""
+    return f"...{api_key[-4:]}" if api_key else ""
+
+
+def usage_to_dict(usage):
+    """把SDK返回的用量对象转成只含数值字段的字典，没有用量时返回空字典"""
+    if usage is None:
+        return {}
+    if isinstance(usage, dict):
+        data = usage
+    elif hasattr(usage, 'model_dump'):
+        data = usage.model_dump()
+    elif hasattr(usage, 'dict'):
+        data = usage.dict()
+    else:
+        data = vars(usage)
+    return {name: value for name, value in data.items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+class UsageTracker:
+    def __init__(self, usage_file, log=None):
+        """初始化用量统计
+
+        Args:
+            usage_file: 用量记录文件路径（JSONL）
+            log: 日志函数，参数为一条消息
+        """
+        self.usage_file = usage_file
+        self.log = log or print
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(usage_file) or '.', exist_ok=True)
+
+    def record(self, service, api_key, model, usage, images=None, job_id=None, batch=None, kind=None):
+        """追加一条用量记录并返回
+
+        Args:
+            service: 'ark' 或 'deepseek'
+            api_key: 请求使用的密钥（只记录末4位）
+            model: 模型名
+            usage: SDK返回的用量对象或字典，可为None
+            images: 实际收到的图像数，用量中没有 generated_images 时使用
+            job_id: 生成任务ID
+            batch: 所属批次ID
+            kind: 请求类型，如 'generate'、'optimize'
+        """
+        tokens = usage_to_dict(usage)
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'service': service,
+            'key': key_fingerprint(api_key),
+            'model': model,
+            'kind': kind,
+            'job_id': job_id,
+            'batch': batch,
+            'images': int(tokens.pop('generated_images', images or 0)),
+            'usage': tokens,
+        }
+        with self._lock:
+            with open(self.usage_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    def recorder(self, service, api_key, model, log_each=True, **fields):
+        """返回记录用量的回调 on_usage(usage, images=None)，记录失败只写日志，不影响请求本身
+
+        批量任务请求很多，可传 log_each=False 不在状态栏逐条显示。
+        """
+        def on_usage(usage, images=None):
+            try:
+                entry = self.record(service, api_key, model, usage, images=images, **fields)
+            except Exception as e:
+                self.log(f"[警告] 记录用量失败: {str(e)}")
+                return
+            if log_each:
+                self.log(f"[用量] {model}: {format_totals(totals_of(entry))}")
+        return on_usage
+
+    def iter_entries(self):
+        """按写入顺序遍历所有用量记录"""
+        if not os.path.exists(self.usage_file):
+            return
+        with open(self.usage_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 跳过写入中断产生的损坏行
+                    continue
+
+    def summarize(self, by, since=None):
+        """按 GROUP_BY 中的方式汇总用量，返回 {分组: 合计}，按分组排序
+
+        Args:
+            by: 'key'、'hour'、'batch' 或 'model'
+            since: 可选，只统计该时间（ISO格式字符串）之后的记录
+        """
+        group_of = GROUP_BY[by]
+        groups = {}
+        for entry in self.iter_entries():
+            if since and entry.get('time', '') < since:
+                continue
+            group = group_of(entry)
+            if group is None:
+                continue
+            totals = groups.setdefault(group, dict.fromkeys(TOTAL_FIELDS, 0))
+            for name, value in totals_of(entry).items():
+                totals[name] += value
+        return dict(sorted(groups.items()))
+
+
+def totals_of(entry):
+    """一条用量记录折算成汇总字段"""
+    usage = entry.get('usage', {})
+    return {
+        'requests': 1,
+        'images': entry.get('images', 0),
+        'prompt_tokens': usage.get('prompt_tokens', 0),
+        'completion_tokens': usage.get('completion_tokens', 0),
+        'output_tokens': usage.get('output_tokens', 0),
+        'total_tokens': usage.get('total_tokens', 0),
+    }
+
+
+def format_totals(totals):
+    """用于状态栏的一行用量说明"""
+    parts = []
+    if totals.get('requests', 0) > 1:
+        parts.append(f"请求 {totals['requests']}")
+    if totals.get('images'):
+        parts.append(f"图像 {totals['images']}")
+    if totals.get('prompt_tokens') or totals.get('completion_tokens'):
+        parts.append(f"输入 {totals['prompt_tokens']} / 输出 {totals['completion_tokens']} tokens")
+    elif totals.get('output_tokens'):
+        parts.append(f"输出 {totals['output_tokens']} tokens")
+    parts.append(f"合计 {totals.get('total_tokens', 0)} tokens")
+    return "，".join(parts)
@@ -8,10 +8,15 @@
 使用方法：
 1. 导入：from volcano_ai_proxy import create_volcano_ai_client
 2. 使用：client = create_volcano_ai_client(api_key, base_url, proxies)
+
+应用内部应使用 get_shared_client / get_shared_deepseek_client：按 (api_key, base_url, 代理) 缓存客户端，
+同一进程内复用带连接池和keep-alive的HTTP客户端，重复请求无需重新建立连接，退出时统一关闭。
 """
 
 import os
 import sys
+import atexit
+import threading
 import httpx
 import logging
 from typing import Dict, Any, Optional, Union
@@ -31,6 +36,14 @@ except ImportError as e:
     logger.error(f"无法导入OpenAI库: {str(e)}")
     logger.error("请确保已安装OpenAI库: pip install openai")
 
+# 异步客户端（批量优化的事件循环模式使用）
+_original_async_openai_available = False
+try:
+    from openai import AsyncOpenAI as OriginalAsyncOpenAI
+    _original_async_openai_available = True
+except ImportError as e:
+    logger.warning(f"无法导入OpenAI异步客户端: {str(e)}")
+
 
 class VolcanoAIClient:
     """火山AI客户端，专为解决DeepSeek API与OpenAI库v1.3.6的兼容性问题而设计。"""
@@ -69,6 +82,10 @@ class VolcanoAIClient:
             )
             logger.info("成功创建OriginalOpenAI实例")
     
+    def close(self):
+        """关闭内部客户端及其HTTP连接池。"""
+        self.client.close()
+    
     # 委托所有属性和方法访问到内部客户端
     def __getattr__(self, name: str) -> Any:
         """委托属性和方法访问到内部OpenAI客户端。"""
@@ -147,6 +164,170 @@ def create_deepseek_client(
     return create_volcano_ai_client(api_key, base_url, proxies, **kwargs)
 
 
+# 共享客户端的默认连接池限制
+DEFAULT_POOL_LIMITS = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60,
+}
+
+# 进程内共享的客户端：(api_key, base_url, 代理URL) -> VolcanoAIClient
+_shared_clients: Dict[tuple, VolcanoAIClient] = {}
+_shared_lock = threading.Lock()
+
+
+def _proxy_url(proxies: Optional[Dict[str, str]]) -> Optional[str]:
+    """从代理配置中取出代理URL（优先使用https）"""
+    if not proxies:
+        return None
+    return proxies.get('https') or proxies.get('http')
+
+
+def get_shared_client(
+    api_key: str,
+    base_url: str,
+    proxies: Optional[Dict[str, str]] = None,
+    timeout: Union[float, httpx.Timeout] = 600,
+    pool_limits: Optional[Dict[str, Any]] = None,
+) -> VolcanoAIClient:
+    """
+    获取进程内共享的客户端，相同 (api_key, base_url, 代理) 只创建一次。
+    
+    客户端使用带连接池和keep-alive的HTTP客户端，可在多个线程中同时使用。
+    
+    Args:
+        api_key (str): API密钥
+        base_url (str): API基础URL
+        proxies (dict, optional): 代理配置字典
+        timeout: 请求超时（秒），只在首次创建时生效
+        pool_limits (dict, optional): 连接池限制，键同 httpx.Limits，只在首次创建时生效
+        
+    Returns:
+        VolcanoAIClient: 共享的客户端实例，不要自行关闭，由 close_shared_clients 统一关闭
+    """
+    proxy_url = _proxy_url(proxies)
+    key = (api_key, base_url, proxy_url)
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is not None:
+            return client
+        
+        limits = dict(DEFAULT_POOL_LIMITS, **(pool_limits or {}))
+        logger.info(f"创建共享客户端: base_url={base_url}, has_proxy={proxy_url is not None}, limits={limits}")
+        http_client = httpx.Client(
+            proxy=proxy_url,
+            timeout=timeout,
+            limits=httpx.Limits(**limits),
+            follow_redirects=True
+        )
+        try:
+            client = VolcanoAIClient(api_key=api_key, base_url=base_url, http_client=http_client)
+        except Exception:
+            http_client.close()
+            raise
+        _shared_clients[key] = client
+        return client
+
+
+def get_shared_deepseek_client(
+    api_key: str,
+    base_url: str = "https://api.deepseek.com",
+    proxies: Optional[Dict[str, str]] = None,
+    **kwargs
+) -> VolcanoAIClient:
+    """获取共享的DeepSeek API客户端的便捷函数。"""
+    return get_shared_client(api_key, base_url, proxies, **kwargs)
+
+
+def close_shared_clients():
+    """关闭所有共享客户端及其连接池（退出时自动调用）"""
+    with _shared_lock:
+        clients = list(_shared_clients.values())
+        _shared_clients.clear()
+    for client in clients:
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"关闭共享客户端失败: {str(e)}")
+
+
+atexit.register(close_shared_clients)
+
+
+class AsyncVolcanoAIClient:
+    """VolcanoAIClient 的异步版本，在事件循环中使用，所有请求方法均需 await。"""
+    
+    def __init__(self, api_key: str, base_url: str, http_client: Optional[httpx.AsyncClient] = None, **kwargs):
+        """初始化异步火山AI客户端。"""
+        self.api_key = api_key
+        self.base_url = base_url
+        
+        if not _original_async_openai_available:
+            raise RuntimeError("OpenAI异步客户端不可用，请升级: pip install -U openai")
+        
+        client_kwargs = kwargs.copy()
+        if http_client:
+            client_kwargs['http_client'] = http_client
+        self.client = OriginalAsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            **client_kwargs
+        )
+    
+    async def close(self):
+        """关闭内部客户端及其HTTP连接池。"""
+        await self.client.close()
+    
+    def __getattr__(self, name: str) -> Any:
+        """委托属性和方法访问到内部OpenAI异步客户端。"""
+        return getattr(self.client, name)
+
+
+def create_async_volcano_ai_client(
+    api_key: str,
+    base_url: str,
+    proxies: Optional[Dict[str, str]] = None,
+    pool_limits: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> AsyncVolcanoAIClient:
+    """
+    创建异步火山AI客户端，需在事件循环中调用，用完后 await client.close()。
+    
+    与共享的同步客户端不同，异步客户端绑定到创建它的事件循环，不做进程内缓存。
+    
+    Args:
+        api_key (str): API密钥
+        base_url (str): API基础URL
+        proxies (dict, optional): 代理配置字典
+        pool_limits (dict, optional): 连接池限制，键同 httpx.Limits
+        **kwargs: 其他传递给OpenAI异步客户端的参数，timeout 用于HTTP客户端
+        
+    Returns:
+        AsyncVolcanoAIClient: 配置好的异步客户端实例
+    """
+    client_kwargs = kwargs.copy()
+    proxy_url = _proxy_url(proxies)
+    limits = dict(DEFAULT_POOL_LIMITS, **(pool_limits or {}))
+    logger.info(f"创建异步客户端: base_url={base_url}, has_proxy={proxy_url is not None}, limits={limits}")
+    http_client = httpx.AsyncClient(
+        proxy=proxy_url,
+        timeout=client_kwargs.pop('timeout', 600),
+        limits=httpx.Limits(**limits),
+        follow_redirects=True
+    )
+    return AsyncVolcanoAIClient(api_key=api_key, base_url=base_url, http_client=http_client, **client_kwargs)
+
+
+def create_async_deepseek_client(
+    api_key: str,
+    base_url: str = "https://api.deepseek.com",
+    proxies: Optional[Dict[str, str]] = None,
+    **kwargs
+) -> AsyncVolcanoAIClient:
+    """创建异步DeepSeek API客户端的便捷函数。"""
+    return create_async_volcano_ai_client(api_key, base_url, proxies, **kwargs)
+
+
 # 简单的测试函数，用于验证功能
 def test_client():
     """简单测试函数，用于验证客户端功能。"""
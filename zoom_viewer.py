@@ -0,0 +1,249 @@
+"""分块渲染的缩放查看器
+
+放大后的4K图像不再整张生成PhotoImage（5倍时约20000像素见方，需要数GB内存），
+而是只渲染可见区域及其周边的若干图块。图块从金字塔层级裁剪缩放生成，按LRU缓存，
+滚动或拖动时只补渲染新露出的图块。内存占用取决于窗口大小而不是缩放比例。
+
+滚轮缩放分两遍渲染：同一帧内的多个滚轮事件合并为一次缩放，先用NEAREST/BILINEAR快速出图，
+滚轮停止一小段时间后再逐块用LANCZOS精细渲染；新的缩放到来时取消尚未完成的精细渲染。
+"""
+
+import tkinter as tk
+from collections import OrderedDict
+
+from PIL import Image, ImageTk
+
+# 图块边长（像素）
+TILE_SIZE = 256
+# 可见区域外额外渲染的边距（像素）
+TILE_MARGIN = TILE_SIZE
+# 缩放范围
+MIN_SCALE = 0.1
+MAX_SCALE = 5.0
+# 合并滚轮事件的帧间隔（毫秒）
+ZOOM_FRAME_MS = 16
+# 滚轮停止多久后开始精细渲染（毫秒）
+REFINE_DELAY_MS = 150
+# 精细渲染每个Tk事件循环周期处理的图块数，避免长时间占用界面线程
+REFINE_TILES_PER_TICK = 4
+
+# 渲染质量
+QUALITY_FAST = "fast"
+QUALITY_HIGH = "high"
+
+
+class ZoomViewer:
+    def __init__(self, canvas, pyramid, scale=1.0, on_pan=None):
+        """在画布上分块显示金字塔图像
+
+        Args:
+            canvas: 用于显示的Canvas，其滚动条应调用本对象的 xview/yview
+            pyramid: ImagePyramid
+            scale: 初始缩放比例
+            on_pan: 可选，用户滚动或拖动后调用，参数为本对象，用于联动其他查看器
+        """
+        self.canvas = canvas
+        self.pyramid = pyramid
+        self.scale = scale
+        self.on_pan = on_pan
+        self._tiles = OrderedDict()   # (缩放比例, 质量, tx, ty) -> PhotoImage
+        self._items = {}              # (tx, ty) -> (画布项ID, PhotoImage, 质量)
+        self._max_tiles = 64
+        self._quality = QUALITY_HIGH
+
+        # 滚轮事件合并与精细渲染调度
+        self._pending_zoom = None     # (目标比例, x, y)
+        self._zoom_after_id = None
+        self._refine_after_id = None
+        self._refine_queue = []
+
+        self.canvas.bind("<Configure>", self._on_configure, add="+")
+        self.canvas.bind("<ButtonPress-1>", self._on_drag_start, add="+")
+        self.canvas.bind("<B1-Motion>", self._on_drag, add="+")
+        self._update_scrollregion()
+
+    # 滚动条接口
+    def xview(self, *args):
+        self.canvas.xview(*args)
+        self._panned()
+
+    def yview(self, *args):
+        self.canvas.yview(*args)
+        self._panned()
+
+    def _on_drag_start(self, event):
+        self.canvas.scan_mark(event.x, event.y)
+
+    def _on_drag(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self._panned()
+
+    def _panned(self):
+        self.refresh()
+        if self.on_pan:
+            self.on_pan(self)
+
+    def view_fractions(self):
+        """当前可见区域左上角在整幅图像中的相对位置 (x, y)"""
+        return self.canvas.xview()[0], self.canvas.yview()[0]
+
+    def move_to(self, x_fraction, y_fraction):
+        """滚动到指定相对位置，不触发 on_pan"""
+        self.canvas.xview_moveto(x_fraction)
+        self.canvas.yview_moveto(y_fraction)
+        self.refresh()
+
+    def _on_configure(self, event=None):
+        # 缓存容量为当前窗口所需图块数的两倍
+        cols = self.canvas.winfo_width() // TILE_SIZE + 2 * (TILE_MARGIN // TILE_SIZE) + 2
+        rows = self.canvas.winfo_height() // TILE_SIZE + 2 * (TILE_MARGIN // TILE_SIZE) + 2
+        self._max_tiles = max(16, 2 * cols * rows)
+        self.refresh()
+
+    def _update_scrollregion(self):
+        width, height = self.pyramid.scaled_size(self.scale)
+        self.canvas.config(scrollregion=(0, 0, width, height))
+
+    def zoom_by(self, factor, x, y):
+        """请求按倍数缩放，同一帧内的多次请求合并为一次渲染"""
+        base = self._pending_zoom[0] if self._pending_zoom else self.scale
+        scale = max(MIN_SCALE, min(base * factor, MAX_SCALE))
+        self._pending_zoom = (scale, x, y)
+        if self._zoom_after_id is None:
+            self._zoom_after_id = self.canvas.after(ZOOM_FRAME_MS, self._apply_pending_zoom)
+
+    def _apply_pending_zoom(self):
+        """快速渲染合并后的缩放，并在滚轮空闲后安排精细渲染"""
+        self._zoom_after_id = None
+        if self._pending_zoom is None:
+            return
+        scale, x, y = self._pending_zoom
+        self._pending_zoom = None
+        self.zoom_at(scale, x, y, quality=QUALITY_FAST)
+        # zoom_at 在缩放到达上下限时提前返回，不会取消之前安排的精细渲染，这里先取消再重新安排
+        self._cancel_refine()
+        self._refine_after_id = self.canvas.after(REFINE_DELAY_MS, self._start_refine)
+
+    def _cancel_refine(self):
+        """取消尚未完成的精细渲染"""
+        if self._refine_after_id is not None:
+            self.canvas.after_cancel(self._refine_after_id)
+            self._refine_after_id = None
+        self._refine_queue = []
+
+    def _start_refine(self):
+        """滚轮空闲后，把当前显示的快速图块排队重新精细渲染"""
+        self._quality = QUALITY_HIGH
+        self._refine_queue = [key for key, (_, _, quality) in self._items.items() if quality != QUALITY_HIGH]
+        self._refine_step()
+
+    def _refine_step(self):
+        """每次处理少量图块，其余留到下一个事件循环周期"""
+        self._refine_after_id = None
+        for _ in range(REFINE_TILES_PER_TICK):
+            if not self._refine_queue:
+                return
+            key = self._refine_queue.pop(0)
+            entry = self._items.get(key)
+            if entry is None:
+                # 图块已滚出可见区域
+                continue
+            photo = self._get_tile(key[0], key[1], QUALITY_HIGH)
+            self.canvas.itemconfig(entry[0], image=photo)
+            self._items[key] = (entry[0], photo, QUALITY_HIGH)
+        if self._refine_queue:
+            self._refine_after_id = self.canvas.after(1, self._refine_step)
+
+    def zoom_at(self, scale, x, y, quality=QUALITY_HIGH):
+        """以画布坐标 (x, y) 处为中心缩放到指定比例"""
+        scale = max(MIN_SCALE, min(scale, MAX_SCALE))
+        if scale == self.scale:
+            return
+        # 旧比例的精细渲染已无意义
+        self._cancel_refine()
+        self._quality = quality
+        # 缩放前鼠标位置对应的原图坐标
+        image_x = self.canvas.canvasx(x) / self.scale
+        image_y = self.canvas.canvasy(y) / self.scale
+
+        self.scale = scale
+        self._clear_items()
+        self._update_scrollregion()
+
+        # 保持该点仍位于鼠标下方
+        width, height = self.pyramid.scaled_size(scale)
+        self.canvas.xview_moveto(max(0.0, (image_x * scale - x) / width))
+        self.canvas.yview_moveto(max(0.0, (image_y * scale - y) / height))
+        self.refresh()
+
+    def _clear_items(self):
+        for item, _, _ in self._items.values():
+            self.canvas.delete(item)
+        self._items.clear()
+
+    def visible_tiles(self):
+        """可见区域（含边距）覆盖的图块范围 (tx0, ty0, tx1, ty1)，均包含端点"""
+        width, height = self.pyramid.scaled_size(self.scale)
+        left = self.canvas.canvasx(0)
+        top = self.canvas.canvasy(0)
+        right = left + max(1, self.canvas.winfo_width())
+        bottom = top + max(1, self.canvas.winfo_height())
+        tx0 = max(0, int((left - TILE_MARGIN) // TILE_SIZE))
+        ty0 = max(0, int((top - TILE_MARGIN) // TILE_SIZE))
+        tx1 = min((width - 1) // TILE_SIZE, int((right + TILE_MARGIN) // TILE_SIZE))
+        ty1 = min((height - 1) // TILE_SIZE, int((bottom + TILE_MARGIN) // TILE_SIZE))
+        return tx0, ty0, tx1, ty1
+
+    def refresh(self):
+        """渲染可见区域内缺少的图块，删除移出范围的图块"""
+        tx0, ty0, tx1, ty1 = self.visible_tiles()
+        wanted = set()
+        for ty in range(ty0, ty1 + 1):
+            for tx in range(tx0, tx1 + 1):
+                wanted.add((tx, ty))
+                if (tx, ty) not in self._items:
+                    photo = self._get_tile(tx, ty, self._quality)
+                    item = self.canvas.create_image(tx * TILE_SIZE, ty * TILE_SIZE, anchor=tk.NW, image=photo)
+                    self._items[(tx, ty)] = (item, photo, self._quality)
+
+        for key in list(self._items):
+            if key not in wanted:
+                self.canvas.delete(self._items.pop(key)[0])
+
+    def _get_tile(self, tx, ty, quality=QUALITY_HIGH):
+        """从LRU缓存获取图块，未命中时渲染"""
+        scale_key = round(self.scale, 6)
+        # 已有精细图块时直接使用
+        for key in ((scale_key, QUALITY_HIGH, tx, ty), (scale_key, quality, tx, ty)):
+            photo = self._tiles.get(key)
+            if photo is not None:
+                self._tiles.move_to_end(key)
+                return photo
+        photo = ImageTk.PhotoImage(self.render_tile(tx, ty, self._resample_for(quality)))
+        self._tiles[(scale_key, quality, tx, ty)] = photo
+        # 画布上正在显示的图块仍被 self._items 引用，不会因淘汰而消失
+        while len(self._tiles) > self._max_tiles:
+            self._tiles.popitem(last=False)
+        return photo
+
+    def _resample_for(self, quality):
+        """快速渲染时放大用NEAREST、缩小用BILINEAR，精细渲染用LANCZOS"""
+        if quality == QUALITY_HIGH:
+            return Image.LANCZOS
+        _, level_scale = self.pyramid.level_for_scale(self.scale)
+        return Image.NEAREST if self.scale > level_scale else Image.BILINEAR
+
+    def render_tile(self, tx, ty, resample=Image.LANCZOS):
+        """从最近的金字塔层级裁剪并缩放出一个图块"""
+        width, height = self.pyramid.scaled_size(self.scale)
+        x0 = tx * TILE_SIZE
+        y0 = ty * TILE_SIZE
+        x1 = min(x0 + TILE_SIZE, width)
+        y1 = min(y0 + TILE_SIZE, height)
+
+        level, level_scale = self.pyramid.level_for_scale(self.scale)
+        # 目标坐标换算到层级坐标
+        factor = level_scale / self.scale
+        box = (x0 * factor, y0 * factor,
+               min(x1 * factor, level.width), min(y1 * factor, level.height))
+        return level.resize((x1 - x0, y1 - y0), resample, box=box)